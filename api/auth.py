@@ -5,11 +5,13 @@ from aiohttp_apispec import (
     response_schema,
 )
 from config import logger
+import config
 from docs import schems as sh
 from functions import auth as func
 from api import validate
 import core
 from functions import mail
+from functions import tokens
 from database.database import Database
 
 @docs(
@@ -36,6 +38,26 @@ async def auth(request: web.Request, parsed : validate.Auth) -> web.Response:
         logger.error("auth error: ", e)
         return web.Response(status=500, text=str(e))
     
+@docs(
+    tags=["Auth"],
+    summary="Обновление access-токена",
+    description="Выдаёт новый access-токен по refresh-токену (поле token из ответа авторизации)",
+    responses={
+        200: {"description": "Новый access-токен выдан", "schema": sh.TokenResponseSchema},
+        400: {"description": "Токен не передан", "schema": sh.Error400Schema},
+        401: {"description": "Refresh-токен неверный"},
+        500: {"description": "Server-side error (Ошибка на стороне сервера)"}
+    }
+)
+@request_schema(sh.TokenRefreshSchema)
+@validate.validate(validate.Auth_refresh)
+async def refresh(request: web.Request, parsed: validate.Auth_refresh) -> web.Response:
+    try:
+        return await tokens.refresh(parsed.token)
+    except Exception as e:
+        logger.error("refresh error: ", e)
+        return web.Response(status=500, text=str(e))
+
 @docs(
     tags=["Auth"],
     summary="Верификация email",
@@ -109,6 +131,27 @@ async def telegram(request: web.Request, parsed: validate.Auth_telegram) -> web.
         logger.error("profile error: ", e)
         return web.Response(status=500, text=str(e))
     
+@docs(
+    tags=["Auth"],
+    summary="Ожидание авторизации через Telegram",
+    description="Держит запрос открытым, пока пользователь не подтвердит вход в боте, но не дольше TELEGRAM_WAIT_TIMEOUT секунд. "
+                "Заменяет периодический опрос POST /auth/telegram: при 401 запрос нужно просто повторить.",
+    responses={
+        200: {"description": "Авторизация через Telegram аккаунт выполнена", "schema": sh.TokenResponseSchema},
+        400: {"description": "Код авторизации не передан", "schema": sh.Error400Schema},
+        401: {"description": "Авторизация не выполнена за время ожидания"},
+        500: {"description": "Server-side error (Ошибка на стороне сервера)"}
+    }
+)
+@request_schema(sh.TokenResponseSchema)
+@validate.validate(validate.Auth_telegram)
+async def telegram_wait(request: web.Request, parsed: validate.Auth_telegram) -> web.Response:
+    try:
+        return await func.wait_auth_token(parsed.token, config.TELEGRAM_WAIT_TIMEOUT)
+    except Exception as e:
+        logger.error("telegram_wait error: ", e)
+        return web.Response(status=500, text=str(e))
+    
 @docs(
     tags=["Auth"],
     summary="Отправка запроса на изменение пароля",
@@ -32,13 +32,13 @@ from api import validate
 @validate.validate(validate.Clubs_list)
 async def info(request: web.Request, parsed : validate.Clubs_list) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         res = await func.list(user_id, parsed.type, parsed.offset, parsed.limit)
+        if isinstance(res, dict):
+            return web.json_response(res, status=200)
         
-        return web.json_response(res, status=200)
+        return core.json_bytes_response(res)
     except Exception as e:
         logger.error("profile error: ", e)
         return web.Response(status=500, text=str(e))
@@ -65,9 +65,7 @@ async def info(request: web.Request, parsed : validate.Clubs_list) -> web.Respon
 @validate.validate(validate.Club_info)
 async def get(request: web.Request, parsed : validate.Club_info) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         res = await func.get(user_id, parsed.club_id)
         
@@ -109,9 +107,7 @@ telegram_url - ссылка на телеграм группу/канал, не
 @validate.validate(validate.Club_new)
 async def new(request: web.Request, parsed : validate.Club_new) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         if (core.contains_bad_text(parsed.title) or
             core.contains_bad_text(parsed.description)):
@@ -153,9 +149,7 @@ async def new(request: web.Request, parsed : validate.Club_new) -> web.Response:
 @validate.validate(validate.Check_title)
 async def check_title(request: web.Request, parsed : validate.Check_title) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.check_title(parsed.title)
         
@@ -188,9 +182,7 @@ async def check_title(request: web.Request, parsed : validate.Check_title) -> we
 )
 async def administrations(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.administrations()
         
@@ -222,9 +214,7 @@ async def administrations(request: web.Request) -> web.Response:
 @validate.validate(validate.Club_join)
 async def join_club(request: web.Request, parsed : validate.Club_join) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.join_club(user_id, parsed.club_id)
         
@@ -259,9 +249,7 @@ async def join_club(request: web.Request, parsed : validate.Club_join) -> web.Re
 @validate.validate(validate.Club_join)
 async def leave_club(request: web.Request, parsed : validate.Club_join) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.leave_club(user_id, parsed.club_id)
         
@@ -297,9 +285,7 @@ async def leave_club(request: web.Request, parsed : validate.Club_join) -> web.R
 @validate.validate(validate.Club_edit)
 async def edit(request: web.Request, parsed : validate.Club_edit) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.edit(user_id, parsed.club_id, parsed.title,
                                    parsed.description, parsed.max_members_counts, parsed.class_limit_min,
@@ -337,11 +323,7 @@ async def edit(request: web.Request, parsed : validate.Club_edit) -> web.Respons
 @validate.validate(validate.Club_delete)
 async def delete(request: web.Request, parsed : validate.Club_delete) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        print(user_id)
-        if not isinstance(user_id, int):
-            return user_id
-        print(parsed.club_id)
+        user_id = request["user"].id
         result = await func.delete(user_id, parsed.club_id)
         
         if isinstance(result, dict):
@@ -375,9 +357,7 @@ async def delete(request: web.Request, parsed : validate.Club_delete) -> web.Res
 )
 async def achievements_global(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.achievements_global()
         
@@ -413,9 +393,7 @@ async def achievements_global(request: web.Request) -> web.Response:
 @validate.validate(validate.Achievements_local)
 async def achievements_local(request: web.Request, parsed: validate.Achievements_local) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         result = await func.achievements_local(parsed.club_id)
         
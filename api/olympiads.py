@@ -27,7 +27,7 @@ async def get(request: web.Request) -> web.Response:
     try:
         res = await func.get()
         
-        return web.json_response(res, status=200)
+        return core.json_bytes_response(res)
     except Exception as e:
         logger.error("profile error: ", e)
         return web.Response(status=500, text=str(e))
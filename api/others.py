@@ -32,9 +32,7 @@ from datetime import date
 )
 async def teachers(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         res = await func.teachers()
         
@@ -34,9 +34,7 @@ from datetime import date
 @validate.validate(validate.Schedule_get)
 async def info(request: web.Request, parsed : validate.Schedule_get) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user = request["user"]
         
         try:
             current_date = parser.parse(parsed.date).date()
@@ -45,7 +43,7 @@ async def info(request: web.Request, parsed : validate.Schedule_get) -> web.Resp
                 "error": "Invalid date format",
                 "received_date": parsed.date
             }, status=400)
-        res = await func.info(user_id, current_date)
+        res = await func.info(user, current_date)
         
         return web.json_response(res, status=200)
     except Exception as e:
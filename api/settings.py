@@ -8,6 +8,8 @@ from config import logger
 from docs import schems as sh
 from functions import settings as func
 import core
+from functions import tokens
+from functions import email_domain
 from api import validate
 
 @docs(
@@ -29,9 +31,7 @@ from api import validate
 )
 async def info(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         res = await func.info(user_id)
         
@@ -65,9 +65,7 @@ async def info(request: web.Request) -> web.Response:
 @validate.validate(validate.Login_patch)
 async def set_login(request: web.Request, parsed : validate.Login_patch) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         login_new = parsed.login
         return await func.set_login(user_id, login_new)
@@ -100,11 +98,11 @@ async def set_login(request: web.Request, parsed : validate.Login_patch) -> web.
 @validate.validate(validate.Email_patch)
 async def set_email(request: web.Request, parsed : validate.Email_patch) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         email_new = parsed.email
+        if not await email_domain.accepts_mail(email_new.split('@')[1]):
+            return validate.email_error_response(validate.EMAIL_ERROR_MESSAGE, parsed.model_dump())
         return await func.set_email(user_id, email_new)
     except Exception as e:
         logger.error("profile error: ", e)
@@ -134,9 +132,7 @@ async def set_email(request: web.Request, parsed : validate.Email_patch) -> web.
 @validate.validate(validate.Password_patch)
 async def set_password(request: web.Request, parsed : validate.Password_patch) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         return await func.set_password(user_id, parsed.current_password, parsed.new_password)
     except Exception as e:
@@ -166,9 +162,7 @@ async def set_password(request: web.Request, parsed : validate.Password_patch) -
 )
 async def telegram_out(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         
         return await func.telegram_out(user_id)
     except Exception as e:
@@ -195,11 +189,11 @@ async def telegram_out(request: web.Request) -> web.Response:
 )
 async def telegram_connect(request: web.Request) -> web.Response:
     try:
-        user_id = await core.check_authorization(request)
-        if not isinstance(user_id, int):
-            return user_id
+        user_id = request["user"].id
         auth_header = request.headers.get('Authorization')
         token = auth_header.split()[1]
+        if tokens.is_access_token(token):
+            token = await func.connect_token(user_id)  # боту нужен токен из таблицы tokens, а не JWT
         return web.json_response({"url": f"https://t.me/schoolhub_ru_bot?start=connect_{token}"}, status=200)
         # return await func.telegram_sign(user_id)
     except Exception as e:
@@ -15,6 +15,24 @@ class EmailError(Exception):
         self.errors = errors or []  # Добавляем атрибут errors
         super().__init__(self.message)
 
+EMAIL_ERROR_MESSAGE = 'Email does not comply with email standards or dns mail servers are not found'
+
+def email_error_response(message: str, all_data: Dict[str, Any]) -> web.Response:
+    """Ответ 422 на неверную почту: из валидатора и из асинхронной проверки домена"""
+    errors = [
+        {
+            "name": "email",
+            "type": "email_validation",
+            "message": message,
+            "value": all_data.get("email"),
+        }
+    ]
+    return web.json_response({
+        "error": "Email validation failed",
+        "errors": errors,
+        "received_params": all_data,
+    }, status=422)
+
 def validate(model: type[T]) -> Callable:
     def decorator(handler: Callable[[web.Request, Any], Awaitable[web.Response]]):
         @wraps(handler)
@@ -45,19 +63,7 @@ def validate(model: type[T]) -> Callable:
                     "received_params": all_data,
                 }, status=400)
             except EmailError as e:
-                errors = [
-                    {
-                        "name": "email",
-                        "type": "email_validation",
-                        "message": e.message,
-                        "value": all_data.get("email"),
-                    }
-                ]
-                return web.json_response({
-                    "error": "Email validation failed",
-                    "errors": errors,
-                    "received_params": all_data,
-                }, status=422)
+                return email_error_response(e.message, all_data)
 
             return await handler(request, parsed)
         return wrapper
@@ -79,6 +85,9 @@ class Auth(BaseModel):
 class Auth_telegram(BaseModel):
     token: str
 
+class Auth_refresh(BaseModel):
+    token: str
+
     
 class Login_patch(BaseModel):
     login: str
@@ -87,6 +96,8 @@ class Login_patch(BaseModel):
     def check_email(cls, v):
         if len(v) > 20:
             raise ValueError('Login cannot exceed 20 characters')
+        if '@' in v:
+            raise ValueError('Login cannot contain @')
         return v
     
 class Email_patch(BaseModel):
@@ -96,8 +107,8 @@ class Email_patch(BaseModel):
     def check_email(cls, v):
         if len(v) > 256:
             raise ValueError('Email cannot exceed 256 characters')
-        if not core.is_valid_email(v):
-            raise EmailError('Email does not comply with email standards or dns mail servers are not found')
+        if not core.is_valid_email(v):  # домен проверяется асинхронно в обработчике
+            raise EmailError(EMAIL_ERROR_MESSAGE)
         return v
     
 class Password_patch(BaseModel):
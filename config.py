@@ -2,6 +2,8 @@ from dotenv import load_dotenv
 import os
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 
 load_dotenv()
@@ -9,17 +11,94 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY")
 
 EMAIL_HOSTNAME = os.getenv("EMAIL_HOSTNAME")
-EMAIL_PORT = os.getenv("EMAIL_PORT")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", 465))
 EMAIL_USERNAME = os.getenv("EMAIL_USERNAME")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "true").lower() == "true"  # false - для локального тестового SMTP
+EMAIL_VALIDATE_CERTS = os.getenv("EMAIL_VALIDATE_CERTS", "false").lower() == "true"
+
+# Очередь писем
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))  # одновременных SMTP-соединений
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))  # писем подряд по одному соединению
+MAIL_IDLE_TIMEOUT = float(os.getenv("MAIL_IDLE_TIMEOUT", 60))  # закрытие простаивающего соединения, секунды
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"  # перечитывать шаблоны писем (разработка)
+
+# Проверка домена почты через DNS
+EMAIL_DNS_NAMESERVERS = [ip.strip() for ip in os.getenv("EMAIL_DNS_NAMESERVERS", "").split(",") if ip.strip()]  # пусто - системные
+EMAIL_DNS_PORT = int(os.getenv("EMAIL_DNS_PORT", 53))
+EMAIL_DNS_TIMEOUT = float(os.getenv("EMAIL_DNS_TIMEOUT", 3))  # секунды на всю проверку
+EMAIL_DNS_CACHE_TTL = float(os.getenv("EMAIL_DNS_CACHE_TTL", 3600))  # секунды
+EMAIL_DNS_NEGATIVE_TTL = float(os.getenv("EMAIL_DNS_NEGATIVE_TTL", 300))  # секунды
 
 DATE_BASE_CONNECT = {"host": os.getenv("DB_IP"), 
              "user": "user", 
              "password": os.getenv("DB_PASSWORD"), 
              "database": "school-hub"}
 
-
-bot = Bot(token=os.getenv("BOT_TOKEN"), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+# Пул соединений с БД (создаётся при старте сервера)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 20))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10))  # секунды
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", 300))  # секунды
+DB_POOL_MAX_QUERIES = int(os.getenv("DB_POOL_MAX_QUERIES", 50000))
+
+# Инструментирование запросов
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))  # порог медленного запроса
+DB_REQUEST_QUERIES_WARN = int(os.getenv("DB_REQUEST_QUERIES_WARN", 20))  # запросов на один HTTP-запрос
+
+# Автомат защиты: после стольких подряд ошибок подключения запросы сразу получают 503
+DB_BREAKER_THRESHOLD = int(os.getenv("DB_BREAKER_THRESHOLD", 5))
+DB_BREAKER_PROBE_INTERVAL = float(os.getenv("DB_BREAKER_PROBE_INTERVAL", 2))  # секунды
+
+# Кеш токенов авторизации в памяти процесса
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 60))  # секунды
+TOKEN_CACHE_NEGATIVE_TTL = float(os.getenv("TOKEN_CACHE_NEGATIVE_TTL", 10))  # для неверных токенов
+
+# Подписанные access-токены (JWT); refresh-токеном служит токен из таблицы tokens
+JWT_SECRET = os.getenv("JWT_SECRET")
+JWT_ACCESS_TTL = int(os.getenv("JWT_ACCESS_TTL", 900))  # секунды
+JWT_REVOCATION_REFRESH = float(os.getenv("JWT_REVOCATION_REFRESH", 15))  # обновление списка отзыва, секунды
+
+# Фоновое удаление просроченных токенов и запросов подтверждения
+SWEEP_INTERVAL = float(os.getenv("SWEEP_INTERVAL", 300))  # секунды
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", 1000))  # строк за одну транзакцию
+SWEEP_LOCK_TIMEOUT_MS = int(os.getenv("SWEEP_LOCK_TIMEOUT_MS", 200))  # ожидание блокировок строк
+
+# Outbox: уведомления, записанные в транзакции запроса и отправляемые в фоне
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 8))  # одновременных отправок
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))  # строк, забираемых за один раз
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))  # после этого - статус dead
+OUTBOX_SEND_TIMEOUT = float(os.getenv("OUTBOX_SEND_TIMEOUT", 30))  # секунды на одну отправку
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 5))  # проверка без NOTIFY, секунды
+
+# Долгий запрос ожидания входа через Telegram
+TELEGRAM_WAIT_TIMEOUT = float(os.getenv("TELEGRAM_WAIT_TIMEOUT", 25))  # секунды
+TELEGRAM_NAME_TTL = float(os.getenv("TELEGRAM_NAME_TTL", 3600))  # имя в Telegram считается свежим, секунды
+TELEGRAM_NAME_MAX_AGE = float(os.getenv("TELEGRAM_NAME_MAX_AGE", 7 * 86400))  # устаревшее имя отдаётся до, секунды
+TELEGRAM_NAME_WAIT = float(os.getenv("TELEGRAM_NAME_WAIT", 0))  # ожидание имени, которого нет в кеше, секунды
+TELEGRAM_NAME_WARMUP = int(os.getenv("TELEGRAM_NAME_WARMUP", 1000))  # имён, загружаемых при запуске
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # свой сервер Bot API (например, тестовый), пусто - api.telegram.org
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))  # сообщений в секунду от бота
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))  # сообщений в секунду в один чат
+
+# Хеширование паролей
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 64))  # задач в работе и в очереди
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", 2 ** 14))  # стоимость scrypt, степень двойки
+
+# Ограничение частоты запросов
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))  # ключей (IP, логинов) на одно правило
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"  # сервер за прокси
+
+# Расписание в памяти процесса
+TIMETABLE_RELOAD_INTERVAL = float(os.getenv("TIMETABLE_RELOAD_INTERVAL", 600))  # полная перезагрузка, если NOTIFY потерян, секунды
+TIMETABLE_CACHE_DATES = int(os.getenv("TIMETABLE_CACHE_DATES", 60))  # дат с заменами и особым временем звонков в кеше
+
+
+bot = Bot(token=os.getenv("BOT_TOKEN"), default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+          session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None)
 
 
 with open('bad_words.txt', 'r', encoding='utf-8') as file:
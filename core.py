@@ -1,33 +1,68 @@
 import secrets, time
 import string, asyncio
 import re, threading
-import dns.resolver
 from aiohttp import web
 from config import logger, bad_words
 from database import functions as func_db
+from database.breaker import DatabaseUnavailable
+from functions import tokens
 from functools import wraps
+from typing import Callable, Set, Union
 
 def contains_bad_text(text: str) -> bool:
     words = text.lower().split()
     return any(word in bad_words for word in words)
 
-async def check_authorization(request:web.Request):
+async def authenticate(request: web.Request) -> Union[func_db.Principal, web.Response]:
+    """Пользователь по заголовку Authorization: access-токен (JWT) проверяется без БД,
+    непрозрачный токен - через общий кеш токенов"""
     try:
         auth_header = request.headers.get('Authorization')
         
         if auth_header:
             parts = auth_header.split()
             if len(parts) == 2 and parts[0].lower() == 'bearer':
-                return await func_db.check_token(parts[1])
+                if tokens.is_access_token(parts[1]):
+                    return tokens.decode_access_token(parts[1])
+                return await func_db.check_token(parts[1])  # непрозрачный токен (старые клиенты)
             else:
                 return web.Response(status=401, text="Invalid Authorization format")
         else:
             return web.Response(status=401, text="Authorization header missing")
+    except DatabaseUnavailable as e:
+        return e.response()
     except Exception as e:
         logger.error("check_authorization error: ", e)
         return web.Response(status=500, text=str(e))
+
+async def check_authorization(request:web.Request):
+    """ID пользователя или web.Response с ошибкой авторизации"""
+    user = request.get("user") or await authenticate(request)
+    return user if isinstance(user, web.Response) else user.id
+
+def auth_middleware(protected_handlers: Set[Callable]):
+    """Middleware авторизации: для обработчиков из protected_handlers пользователь
+    определяется один раз и кладётся в request["user"]. Публичные маршруты, статика
+    и служебные маршруты (swagger, CORS preflight) пропускаются без проверки"""
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        if request.match_info.handler not in protected_handlers:
+            return await handler(request)
+        user = await authenticate(request)
+        if isinstance(user, web.Response):
+            return user
+        request["user"] = user
+        return await handler(request)
+    return middleware
     
 
+def json_bytes_response(body: bytes, status: int = 200) -> web.Response:
+    """Ответ с готовым JSON, например из Database.fetch_json()"""
+    if body is None:
+        return web.Response(status=500, text="Database error")
+    return web.Response(body=body, status=status, content_type='application/json')
+
+
 def generate_unique_code(length:int=32):
     """Генерация рандомного кода из символов латиницы, цифры и _
 
@@ -54,7 +89,8 @@ def is_domain_valid(domain):
     return True
 
 def is_valid_email(email:str) -> bool:
-    """Проверка реальности почты"""
+    """Проверка формата почты. Наличие почтового сервера у домена проверяется
+    асинхронно: functions.email_domain.accepts_mail"""
     regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     if not re.match(regex, email):
         return False
@@ -73,17 +109,7 @@ def is_valid_email(email:str) -> bool:
     if len(domain_part) > 255:
         return False
 
-    try:
-        dns.resolver.resolve(domain_part, 'MX')
-        return True
-    except (dns.resolver.NoAnswer, dns.exception.Timeout):
-        try:
-            dns.resolver.resolve(domain_part, 'A')
-            return True
-        except (dns.resolver.NoAnswer, dns.exception.Timeout):
-            return False
-    except:
-        return False
+    return True
     
 
 def is_hashable(obj):
@@ -0,0 +1,87 @@
+"""Автомат защиты (circuit breaker) для соединений с БД.
+
+После DB_BREAKER_THRESHOLD подряд неудачных подключений автомат размыкается, и все
+запросы сразу получают DatabaseUnavailable (503 + Retry-After) вместо ожидания
+переподключения. Пока автомат разомкнут, одна фоновая задача периодически проверяет
+БД и замыкает его, как только база снова отвечает.
+"""
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, Optional
+from aiohttp import web
+from config import logger
+
+
+class DatabaseUnavailable(Exception):
+    """БД недоступна - запрос нужно повторить позже"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Database unavailable, retry after {self.retry_after} s")
+
+    def response(self) -> web.Response:
+        return web.Response(status=503, text="Database unavailable",
+                            headers={"Retry-After": str(self.retry_after)})
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, probe_interval: float, probe: Callable[[], Awaitable[None]]):
+        """
+        :param threshold: Число подряд неудачных подключений до размыкания
+        :param probe_interval: Пауза между проверками БД при разомкнутом автомате, секунды
+        :param probe: Корутина проверки БД, должна выбросить исключение, если БД недоступна
+        """
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self._probe = probe
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._prober: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    @property
+    def retry_after(self) -> float:
+        return self.probe_interval
+
+    def check(self) -> None:
+        """Быстрый отказ, если автомат разомкнут"""
+        if self.is_open:
+            raise DatabaseUnavailable(self.retry_after)
+
+    def success(self) -> None:
+        self.failures = 0
+
+    def failure(self, error: Exception) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold and not self.is_open:
+            self.opened_at = time.monotonic()
+            logger.error(f"БД недоступна после {self.failures} попыток подключения ({error}), "
+                         f"запросы отклоняются до восстановления")
+            self._prober = asyncio.get_running_loop().create_task(self._run_prober())
+
+    async def _run_prober(self) -> None:
+        while self.is_open:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self._probe()
+            except Exception as e:
+                logger.warning(f"БД всё ещё недоступна: {e}")
+                continue
+            logger.info(f"Соединение с БД восстановлено через {time.monotonic() - self.opened_at:.0f} с")
+            self.opened_at = None
+            self.failures = 0
+        self._prober = None
+
+    async def close(self) -> None:
+        """Остановка фоновой проверки (при завершении сервера)"""
+        if self._prober is not None:
+            self._prober.cancel()
+            try:
+                await self._prober
+            except asyncio.CancelledError:
+                pass
+            self._prober = None
@@ -1,40 +1,222 @@
 import json
+import time
 import asyncio
-from typing import Union, List, Dict, Optional
-from asyncpg import Connection, connect, Record, PostgresConnectionError
-from config import DATE_BASE_CONNECT, logger
+from contextvars import ContextVar
+from typing import Union, List, Dict, Optional, Tuple, Sequence, Iterable, AsyncIterable, AsyncIterator
+from aiohttp import web
+from asyncpg import Connection, connect, create_pool, Record, PostgresConnectionError
+from asyncpg.pool import Pool
+from config import (DATE_BASE_CONNECT, logger, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE,
+                    DB_POOL_ACQUIRE_TIMEOUT, DB_POOL_MAX_INACTIVE_LIFETIME, DB_POOL_MAX_QUERIES,
+                    DB_REQUEST_QUERIES_WARN, DB_BREAKER_THRESHOLD, DB_BREAKER_PROBE_INTERVAL)
+from database import queries, metrics
+from database.breaker import CircuitBreaker, DatabaseUnavailable
+from database.queries import Query
+
+SQL = Union[str, Query]  # Текст запроса или именованный запрос из database.queries.Q
+
+# Кеш подготовленных выражений соединения должен вмещать весь реестр запросов
+STATEMENT_CACHE_SIZE = max(100, queries.count() * 2)
+
+
+def _is_select(sql: SQL) -> bool:
+    if isinstance(sql, Query):
+        return sql.is_select
+    return sql.strip().lower().startswith('select')
+
+
+def _returns_rows(sql: SQL) -> bool:
+    if isinstance(sql, Query):
+        return sql.returns_rows
+    return _is_select(sql) or queries._has_returning(sql)
+
+
+def _track(sql: SQL, started: float, rows: Optional[int] = None, params_count: int = 0) -> None:
+    """Учёт выполненного запроса: метрики и счётчик текущего HTTP-запроса"""
+    elapsed = time.perf_counter() - started
+    metrics.record(sql, elapsed, rows, params_count)
+    scope = _request_scope.get()
+    if scope is not None:
+        scope.queries += 1
+        scope.db_time += elapsed
+
+
+def _status_rows(status: str) -> Optional[int]:
+    """Число строк из статуса команды, например 'UPDATE 3'"""
+    tail = status.rsplit(' ', 1)[-1] if status else ''
+    return int(tail) if tail.isdigit() else None
+
+
+async def _acquire() -> Tuple[Connection, bool]:
+    """Соединение из пула, если он создан, иначе отдельное соединение"""
+    if Database.pool is not None:
+        return await Database.pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT), True
+    return await connect(**DATE_BASE_CONNECT, statement_cache_size=STATEMENT_CACHE_SIZE), False
 
-class Database:
-    MAX_RETRIES = 30
-    RETRY_DELAY = 1  # seconds
+
+async def _release(connection: Connection, from_pool: bool) -> None:
+    """Возврат соединения в пул или его закрытие"""
+    if from_pool:
+        await Database.pool.release(connection)
+    else:
+        await connection.close()
+
+
+class RequestScope:
+    """Одно соединение на HTTP-запрос: его используют и проверка токена, и обработчик.
+    Соединение берётся при первом обращении к БД и освобождается middleware.
+    Блоки Database внутри запроса должны выполняться последовательно."""
 
     def __init__(self):
+        self.connection: Optional[Connection] = None
+        self._from_pool = False
+        self.queries = 0  # выполнено запросов за HTTP-запрос
+        self.db_time = 0.0  # суммарное время запросов, секунды
+        self.unavailable: Optional[DatabaseUnavailable] = None  # БД отказала во время запроса
+
+    async def acquire(self) -> Connection:
+        if self.connection is None:
+            self.connection, self._from_pool = await _acquire()
+        return self.connection
+
+    async def release(self) -> None:
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            try:
+                await _release(connection, self._from_pool)
+            except Exception as e:
+                logger.error(f"Ошибка при освобождении соединения запроса: {e}")
+
+
+_request_scope: ContextVar[Optional[RequestScope]] = ContextVar("db_request_scope", default=None)
+
+
+async def _probe() -> None:
+    """Проверка доступности БД отдельным соединением в обход пула"""
+    connection = await connect(**DATE_BASE_CONNECT, timeout=DB_BREAKER_PROBE_INTERVAL)
+    try:
+        await connection.fetchval("SELECT 1")
+    finally:
+        await connection.close()
+
+
+# Общий для всех запросов автомат защиты соединений с БД
+breaker = CircuitBreaker(DB_BREAKER_THRESHOLD, DB_BREAKER_PROBE_INTERVAL, _probe)
+
+
+def _unavailable(retry_after: float) -> DatabaseUnavailable:
+    """Исключение о недоступности БД; текущий HTTP-запрос помечается для ответа 503"""
+    error = DatabaseUnavailable(retry_after)
+    scope = _request_scope.get()
+    if scope is not None:
+        scope.unavailable = error
+    return error
+
+
+class Database:
+    pool: Optional[Pool] = None  # Общий пул приложения, см. create_pool()
+
+    def __init__(self, readonly: bool = False, autocommit: bool = False):
+        """
+        :param readonly: Режим только для чтения - запросы выполняются в autocommit
+                         без BEGIN/COMMIT, изменяющие запросы отклоняются
+        :param autocommit: Без общей транзакции, каждый запрос фиксируется сразу
+                           (нужно, например, для CREATE INDEX CONCURRENTLY)
+        """
         self.connection: Optional[Connection] = None
         self.transaction = None
-        self._retry_count = 0
+        self.readonly = readonly
+        self.autocommit = autocommit or readonly
+        self.last_error: Optional[Exception] = None  # последняя ошибка запроса в этом блоке
+        self._from_pool = False
+        self._scope: Optional[RequestScope] = None
+
+    @classmethod
+    async def create_pool(cls) -> Pool:
+        """Создание общего пула соединений. Без пула каждый Database открывает своё соединение"""
+        if cls.pool is None:
+            cls.pool = await create_pool(
+                **DATE_BASE_CONNECT,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_queries=DB_POOL_MAX_QUERIES,
+                max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+                statement_cache_size=STATEMENT_CACHE_SIZE,
+            )
+            logger.info(f"Пул соединений с БД создан ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE})")
+        return cls.pool
+
+    @classmethod
+    async def close_pool(cls) -> None:
+        """Закрытие общего пула соединений"""
+        if cls.pool is not None:
+            pool, cls.pool = cls.pool, None
+            try:
+                await asyncio.wait_for(pool.close(), timeout=DB_POOL_ACQUIRE_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Ошибка при закрытии пула соединений: {e}")
+                pool.terminate()
+
+    async def _connect(self) -> Connection:
+        """Соединение текущего HTTP-запроса, если он есть, иначе собственное"""
+        self._scope = _request_scope.get()
+        if self._scope is not None:
+            return await self._scope.acquire()
+        connection, self._from_pool = await _acquire()
+        return connection
+
+    async def _disconnect(self, failed: bool = False) -> None:
+        """Возврат соединения в пул или его закрытие. Соединение запроса
+        остаётся открытым до конца запроса, если с ним не случилась ошибка"""
+        if self._scope is not None:
+            scope, self._scope = self._scope, None
+            if failed:
+                await scope.release()
+            return
+        await _release(self.connection, self._from_pool)
 
     async def __aenter__(self):
-        """Установка соединения с автоматическим переподключением"""
+        """Установка соединения. Если БД недоступна - сразу DatabaseUnavailable, без ожидания"""
         self.connection = None
         self.transaction = None
-        
-        while self._retry_count < self.MAX_RETRIES:
-            try:
-                self.connection = await connect(**DATE_BASE_CONNECT)
+        try:
+            breaker.check()
+        except DatabaseUnavailable as e:
+            raise _unavailable(e.retry_after)
+
+        try:
+            self.connection = await self._connect()
+            if not self.autocommit:
                 self.transaction = self.connection.transaction()
                 await self.transaction.start()
-                self._retry_count = 0  # Сброс счетчика при успешном подключении
-                return self
-            except PostgresConnectionError as e:
-                self._retry_count += 1
-                logger.error(f"Попытка подключения {self._retry_count}/{self.MAX_RETRIES} failed: {e}")
-                await asyncio.sleep(self.RETRY_DELAY)
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка подключения: {e}")
-                break
+        except asyncio.TimeoutError as e:
+            # Пул исчерпан: БД жива, но перегружена - автомат не размыкаем
+            await self._release_failed()
+            logger.error(f"Нет свободных соединений в пуле за {DB_POOL_ACQUIRE_TIMEOUT} с")
+            raise _unavailable(1) from e
+        except (PostgresConnectionError, OSError) as e:
+            await self._release_failed()
+            logger.error(f"Ошибка подключения к БД: {e}")
+            breaker.failure(e)
+            raise _unavailable(breaker.retry_after) from e
+        except Exception as e:
+            await self._release_failed()
+            logger.error(f"Неожиданная ошибка подключения: {e}")
+            raise
+
+        breaker.success()
+        return self
 
-        logger.error("Превышено максимальное количество попыток подключения")
-        return None
+    async def _release_failed(self) -> None:
+        """Освобождение соединения, если ошибка случилась после его получения"""
+        if self.connection is not None:
+            try:
+                await self._disconnect(failed=True)
+            except Exception as e:
+                logger.error(f"Ошибка при освобождении соединения: {e}")
+            finally:
+                self.connection = None
+                self.transaction = None
 
     async def __aexit__(self, exc_type, exc_value, traceback):
         """Безопасное закрытие соединения"""
@@ -54,7 +236,7 @@ class Database:
         finally:
             if self.connection:
                 try:
-                    await self.connection.close()
+                    await self._disconnect()
                 except Exception as e:
                     logger.error(f"Ошибка при закрытии соединения: {e}")
                 finally:
@@ -70,7 +252,7 @@ class Database:
                 logger.error(f"Ошибка при коммите при закрытии: {e}")
         if self.connection and not self.connection.is_closed():
             try:
-                await self.connection.close()
+                await self._disconnect()
             except Exception as e:
                 logger.error(f"Ошибка при закрытии соединения: {e}")
             finally:
@@ -103,66 +285,164 @@ class Database:
             logger.error(f"Ошибка сериализации данных: {e}")
             return None
 
-    async def execute_all(self, sql: str, params: tuple = ()) -> Optional[List[Dict]]:
+    async def execute_all(self, sql: SQL, params: tuple = ()) -> Optional[List[Dict]]:
         """Выполнение SELECT-запросов с множественным результатом"""
-        if not await self._check_connection():
+        if not await self._check_connection() or not self._check_readonly(sql):
             return None
             
+        started, rows = time.perf_counter(), None
         try:
-            if sql.strip().lower().startswith('select'):
-                result = await self.connection.fetch(sql, *params)
+            if _returns_rows(sql):
+                result = await self.connection.fetch(str(sql), *params)
+                rows = len(result)
                 return self.serialize(result)
             else:
-                await self.connection.execute(sql, *params)
+                rows = _status_rows(await self.connection.execute(str(sql), *params))
                 return []
         except Exception as e:
             self._handle_exception(e, sql)
             return None
+        finally:
+            _track(sql, started, rows, len(params))
 
-    async def execute(self, sql: str, params: tuple = ()) -> Optional[Dict]:
+    async def execute(self, sql: SQL, params: tuple = ()) -> Optional[Dict]:
         """Выполнение SELECT-запросов с единичным результатом"""
-        if not await self._check_connection():
+        if not await self._check_connection() or not self._check_readonly(sql):
             return None
             
+        started, rows = time.perf_counter(), None
         try:
-            if sql.strip().lower().startswith('select'):
-                result = await self.connection.fetchrow(sql, *params)
+            if _returns_rows(sql):
+                result = await self.connection.fetchrow(str(sql), *params)
+                rows = 0 if result is None else 1
                 return self.serialize(result)
             else:
-                await self.connection.execute(sql, *params)
+                rows = _status_rows(await self.connection.execute(str(sql), *params))
                 return {}
         except Exception as e:
             self._handle_exception(e, sql)
             return None
+        finally:
+            _track(sql, started, rows, len(params))
+
+    async def fetch_json(self, sql: SQL, params: tuple = ()) -> Optional[bytes]:
+        """Результат SELECT сразу в виде JSON-массива (байты), без построения dict на каждую строку.
+        Сериализацию выполняет PostgreSQL (json_agg), ответ можно отдавать клиенту как есть"""
+        if not await self._check_connection() or not self._check_readonly(sql):
+            return None
+        if not _is_select(sql):
+            logger.error("fetch_json() поддерживает только SELECT-запросы")
+            return None
+
+        sql = sql.as_json() if isinstance(sql, Query) else queries.json_query(sql)
+        started = time.perf_counter()
+        try:
+            result = await self.connection.fetchval(str(sql), *params)
+            return result.encode('utf-8')
+        except Exception as e:
+            self._handle_exception(e, sql)
+            return None
+        finally:
+            _track(sql, started, params_count=len(params))
 
-    async def fetchval(self, sql: str, params: tuple = ()) -> Optional[int]:
+    async def fetchval(self, sql: SQL, params: tuple = ()) -> Optional[int]:
         """Получение скалярного значения"""
-        if not await self._check_connection():
+        if not await self._check_connection() or not self._check_readonly(sql, write=True):
             return None
             
+        started = time.perf_counter()
         try:
-            if "RETURNING" not in sql.upper():
-                sql = f"{sql} RETURNING id"
+            text = str(sql)
+            if "RETURNING" not in text.upper():
+                text = f"{text} RETURNING id"
                 
-            return await self.connection.fetchval(sql, *params)
+            return await self.connection.fetchval(text, *params)
         except Exception as e:
             self._handle_exception(e, sql)
             return None
+        finally:
+            _track(sql, started, 1, len(params))
+
+    async def execute_rowcount(self, sql: SQL, params: tuple = ()) -> Optional[int]:
+        """Выполнение изменяющего запроса, результат - число затронутых строк"""
+        if not await self._check_connection() or not self._check_readonly(sql, write=True):
+            return None
+
+        started, rows = time.perf_counter(), None
+        try:
+            rows = _status_rows(await self.connection.execute(str(sql), *params))
+            return rows or 0
+        except Exception as e:
+            self._handle_exception(e, sql)
+            return None
+        finally:
+            _track(sql, started, rows, len(params))
 
-    async def executemany(self, sql: str, params: List[tuple] = []) -> Optional[bool]:
+    async def executemany(self, sql: SQL, params: List[tuple] = []) -> Optional[bool]:
         """Выполнение массовых операций"""
-        if not await self._check_connection():
+        if not await self._check_connection() or not self._check_readonly(sql, write=True):
             return None
             
+        started = time.perf_counter()
         try:
-            if sql.strip().lower().startswith('select'):
+            if _is_select(sql):
                 logger.error("Используйте execute() для SELECT-запросов")
                 return None
-            await self.connection.executemany(sql, params)
+            await self.connection.executemany(str(sql), params)
             return True
         except Exception as e:
             self._handle_exception(e, sql)
             return None
+        finally:
+            _track(sql, started, len(params), len(params[0]) if params else 0)
+
+    async def iterate(self, sql: SQL, params: tuple = (), batch_size: int = 500) -> AsyncIterator[Dict]:
+        """Потоковое чтение SELECT через серверный курсор: строки подгружаются
+        пачками по batch_size, поэтому память не зависит от размера таблицы.
+        Курсор работает внутри транзакции; в режимах readonly/autocommit она
+        открывается только на время чтения
+
+            async for row in db.iterate("SELECT * FROM users", batch_size=1000):
+                ...
+        """
+        if not await self._check_connection() or not self._check_readonly(sql):
+            return
+        if not _is_select(sql):
+            logger.error("iterate() поддерживает только SELECT-запросы")
+            return
+
+        started, rows = time.perf_counter(), 0
+        try:
+            async with self.connection.transaction(readonly=self.readonly):
+                async for record in self.connection.cursor(str(sql), *params, prefetch=batch_size):
+                    rows += 1
+                    yield self.serialize(record)
+        except Exception as e:
+            self._handle_exception(e, sql)
+        finally:
+            _track(sql, started, rows, len(params))
+
+    async def copy_records(self, table: str, columns: Sequence[str],
+                           rows: Union[Iterable[tuple], AsyncIterable[tuple]]) -> Optional[int]:
+        """Массовая загрузка строк через бинарный COPY.
+        rows может быть обычным или асинхронным итератором - строки читаются
+        по мере передачи и не накапливаются в памяти
+
+        :return: Количество загруженных строк
+        """
+        if not await self._check_connection() or not self._check_readonly(table, write=True):
+            return None
+
+        started, count = time.perf_counter(), None
+        try:
+            status = await self.connection.copy_records_to_table(table, records=rows, columns=list(columns))
+            count = _status_rows(status)
+            return count
+        except Exception as e:
+            self._handle_exception(e, f"COPY {table} ({', '.join(columns)})")
+            return None
+        finally:
+            _track(f"COPY {table}", started, count, len(columns))
 
     async def _check_connection(self) -> bool:
         """Проверка активности соединения"""
@@ -171,10 +451,67 @@ class Database:
             return False
         return True
 
-    def _handle_exception(self, exception: Exception, sql: str) -> None:
+    def _check_readonly(self, sql: SQL, write: bool = False) -> bool:
+        """Запрет изменяющих запросов в режиме только для чтения"""
+        if self.readonly and (write or not _is_select(sql)):
+            logger.error(f"Изменяющий запрос в режиме только для чтения\nSQL: {sql}")
+            return False
+        return True
+
+    def _handle_exception(self, exception: Exception, sql: SQL) -> None:
         """Единый обработчик ошибок с логированием"""
+        self.last_error = exception
         error_msg = f"{exception.__class__.__name__}: {exception}\nSQL: {sql}"
         if isinstance(exception, PostgresConnectionError):
             logger.error(f"Ошибка подключения к БД: {error_msg}")
         else:
-            logger.error(f"Ошибка выполнения запроса: {error_msg}")
\ No newline at end of file
+            logger.error(f"Ошибка выполнения запроса: {error_msg}")
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: создание общего пула соединений"""
+    await Database.create_pool()
+
+
+async def on_cleanup(app) -> None:
+    """aiohttp on_cleanup: закрытие общего пула соединений"""
+    for item in metrics.snapshot():
+        histogram = {bucket: count for bucket, count in item["histogram"].items() if count}
+        logger.info(f"Запрос {item['statement']}: вызовов {item['calls']}, строк {item['rows']}, "
+                    f"всего {item['total_ms']} мс, p50 {item['p50_ms']} мс, p95 {item['p95_ms']} мс, "
+                    f"макс. {item['max_ms']} мс, мс: {histogram}")
+    await breaker.close()
+    await Database.close_pool()
+
+
+async def release_request_connection() -> None:
+    """Досрочный возврат соединения текущего HTTP-запроса в пул, например перед долгим
+    ожиданием. Следующий блок Database в этом запросе возьмёт соединение заново"""
+    scope = _request_scope.get()
+    if scope is not None:
+        await scope.release()
+
+
+@web.middleware
+async def request_scope_middleware(request: web.Request, handler):
+    """Одно соединение с БД на весь запрос, освобождается после ответа обработчика.
+    Если БД оказалась недоступна, клиент получает 503 с Retry-After вместо 500"""
+    scope = RequestScope()
+    token = _request_scope.set(scope)
+    try:
+        response = await handler(request)
+    except DatabaseUnavailable as e:
+        return e.response()
+    finally:
+        _request_scope.reset(token)
+        await scope.release()
+        request["db_queries"] = scope.queries
+        request["db_time"] = scope.db_time
+        if scope.queries >= DB_REQUEST_QUERIES_WARN:
+            logger.warning(f"{request.method} {request.path}: {scope.queries} запросов к БД "
+                           f"за {scope.db_time * 1000:.1f} мс")
+    # Обработчики перехватывают все исключения и отвечают 500 или 200 с {"status": "error"} -
+    # если БД отказала во время запроса, любой такой ответ заменяем на 503
+    if scope.unavailable is not None:
+        return scope.unavailable.response()
+    return response
@@ -0,0 +1,87 @@
+"""Подписка на уведомления PostgreSQL (LISTEN/NOTIFY).
+
+Для всех каналов используется одно отдельное соединение вне пула. При его потере
+подписки восстанавливаются автоматически; уведомления, отправленные за время
+переподключения, теряются, поэтому подписчики должны уметь перепроверить состояние сами.
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional
+from asyncpg import Connection, connect
+from config import DATE_BASE_CONNECT, logger, DB_BREAKER_PROBE_INTERVAL
+
+# callback(payload) - вызывается в цикле событий, не должен блокировать
+Callback = Callable[[str], None]
+
+_callbacks: Dict[str, List[Callback]] = {}
+_connection: Optional[Connection] = None
+_reconnect: Optional[asyncio.Task] = None
+_closing = False
+
+
+def subscribe(channel: str, callback: Callback) -> None:
+    """Подписка на канал; вызывается до запуска сервера (или после - тогда LISTEN при переподключении)"""
+    _callbacks.setdefault(channel, []).append(callback)
+
+
+def _dispatch(connection: Connection, pid: int, channel: str, payload: str) -> None:
+    for callback in _callbacks.get(channel, ()):
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.error(f"Ошибка обработчика уведомления {channel}: {e}")
+
+
+def _on_terminate(connection: Connection) -> None:
+    global _connection, _reconnect
+    _connection = None
+    if not _closing and _reconnect is None:
+        logger.warning("Соединение LISTEN потеряно, переподключение")
+        _reconnect = asyncio.get_running_loop().create_task(_connect_forever())
+
+
+async def _connect() -> None:
+    global _connection
+    connection = await connect(**DATE_BASE_CONNECT)
+    for channel in _callbacks:
+        await connection.add_listener(channel, _dispatch)
+    connection.add_termination_listener(_on_terminate)
+    _connection = connection
+
+
+async def _connect_forever() -> None:
+    global _reconnect
+    while not _closing:
+        try:
+            await _connect()
+            break
+        except Exception as e:
+            logger.warning(f"Не удалось подключиться для LISTEN: {e}")
+            await asyncio.sleep(DB_BREAKER_PROBE_INTERVAL)
+    _reconnect = None
+
+
+def is_connected() -> bool:
+    return _connection is not None and not _connection.is_closed()
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: соединение LISTEN; сервер стартует и без него"""
+    global _closing, _reconnect
+    _closing = False
+    if _callbacks:
+        _reconnect = asyncio.get_running_loop().create_task(_connect_forever())
+
+
+async def on_cleanup(app) -> None:
+    global _closing, _connection, _reconnect
+    _closing = True
+    if _reconnect is not None:
+        _reconnect.cancel()
+        try:
+            await _reconnect
+        except asyncio.CancelledError:
+            pass
+        _reconnect = None
+    if _connection is not None:
+        connection, _connection = _connection, None
+        await connection.close()
@@ -0,0 +1,98 @@
+"""Метрики запросов к БД: гистограммы времени выполнения, число строк и журнал медленных запросов.
+
+Запросы группируются по отпечатку (fingerprint): для именованных запросов это имя
+из database.queries.Q, для остальных - текст SQL без литералов и лишних пробелов.
+"""
+import re
+from typing import Dict, List, Optional
+from config import logger, DB_SLOW_QUERY_MS
+
+# Верхние границы корзин гистограммы, мс
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_space_re = re.compile(r"\s+")
+
+
+def fingerprint(sql) -> str:
+    """Отпечаток запроса: имя именованного запроса или SQL без литералов"""
+    name = getattr(sql, "name", "")
+    if name:
+        return name
+    text = _literal_re.sub("?", str(sql))
+    return _space_re.sub(" ", text).strip()[:200]
+
+
+class StatementStats:
+    """Статистика одного отпечатка запроса"""
+
+    __slots__ = ("calls", "total_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)  # последняя корзина - больше BUCKETS[-1]
+
+    def add(self, elapsed_ms: float, rows: Optional[int]) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if rows:
+            self.rows += rows
+        for index, bound in enumerate(BUCKETS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, p: float) -> float:
+        """Оценка перцентиля по гистограмме (верхняя граница корзины), мс"""
+        if not self.calls:
+            return 0.0
+        target = self.calls * p
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return min(float(BUCKETS[index]), self.max_ms) if index < len(BUCKETS) else self.max_ms
+        return self.max_ms
+
+
+_statements: Dict[str, StatementStats] = {}
+
+
+def record(sql, elapsed: float, rows: Optional[int] = None, params_count: int = 0) -> None:
+    """Учёт выполненного запроса; elapsed - в секундах"""
+    key = fingerprint(sql)
+    stats = _statements.get(key)
+    if stats is None:
+        stats = _statements[key] = StatementStats()
+    elapsed_ms = elapsed * 1000
+    stats.add(elapsed_ms, rows)
+    if elapsed_ms >= DB_SLOW_QUERY_MS:
+        logger.warning(f"Медленный запрос {elapsed_ms:.1f} мс: {key} "
+                       f"(параметров: {params_count}, строк: {rows if rows is not None else '?'})")
+
+
+def snapshot() -> List[Dict]:
+    """Текущие метрики по всем отпечаткам, самые затратные первыми"""
+    result = []
+    for key, stats in _statements.items():
+        result.append({
+            "statement": key,
+            "calls": stats.calls,
+            "rows": stats.rows,
+            "total_ms": round(stats.total_ms, 3),
+            "max_ms": round(stats.max_ms, 3),
+            "p50_ms": stats.percentile(0.5),
+            "p95_ms": stats.percentile(0.95),
+            "histogram": dict(zip([f"<={b}" for b in BUCKETS] + [f">{BUCKETS[-1]}"], stats.buckets)),
+        })
+    return sorted(result, key=lambda item: item["total_ms"], reverse=True)
+
+
+def reset() -> None:
+    _statements.clear()
@@ -0,0 +1,465 @@
+"""Версионные миграции схемы БД.
+
+Применённые версии хранятся в таблице schema_version. При старте сервера migrate()
+только сверяет версию и применяет недостающие миграции. Индексы строятся через
+CREATE INDEX CONCURRENTLY, поэтому миграции можно накатывать на работающую базу.
+Одновременный запуск из нескольких процессов сериализуется advisory lock.
+"""
+from typing import List, Union
+from asyncpg import Connection
+from config import logger
+from database.database import Database
+
+SCHEMA_LOCK_KEY = 724031501  # ключ pg_advisory_lock для миграций
+
+
+class Index:
+    """Индекс, который строится без блокировки записи в таблицу"""
+
+    def __init__(self, name: str, table: str, columns: str, unique: bool = False):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.unique = unique
+
+    def sql(self) -> str:
+        unique = "UNIQUE " if self.unique else ""
+        return f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON public.{self.table} {self.columns}"
+
+
+class Migration:
+    """Одна версия схемы. Миграция с индексами выполняется без транзакции (CONCURRENTLY),
+    остальные - целиком в одной транзакции"""
+
+    def __init__(self, version: int, description: str, statements: List[Union[str, Index]]):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.concurrent = any(isinstance(statement, Index) for statement in statements)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Базовая схема", [
+        """CREATE TABLE IF NOT EXISTS public.users
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 9223372036854775807 CACHE 1 ),
+    email character varying COLLATE pg_catalog."default",
+    name character varying COLLATE pg_catalog."default" NOT NULL,
+    surname character varying COLLATE pg_catalog."default" NOT NULL,
+    password character varying COLLATE pg_catalog."default" NOT NULL,
+    telegram_id bigint,
+    login character varying(20) COLLATE pg_catalog."default" NOT NULL,
+    class_number integer NOT NULL,
+    class_letter character varying(1) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT users_pkey PRIMARY KEY (id),
+    CONSTRAINT users_email_key UNIQUE (email)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.subjects
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(20) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT subjects_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.administrations
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(64) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT administrations_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.tokens
+(
+    token character varying(32) COLLATE pg_catalog."default" NOT NULL,
+    user_id bigint NOT NULL,
+    CONSTRAINT tokens_pkey PRIMARY KEY (token),
+    CONSTRAINT tokens_user_id_fkey FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS public.teachers
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999 CACHE 1 ),
+    name character varying(60) COLLATE pg_catalog."default" NOT NULL,
+    admin boolean NOT NULL DEFAULT false,
+    subject bigint NOT NULL,
+    CONSTRAINT teachers_pkey PRIMARY KEY (id),
+    CONSTRAINT subject FOREIGN KEY (subject)
+        REFERENCES public.subjects (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE NO ACTION
+)""",
+        """CREATE TABLE IF NOT EXISTS public.olympiads
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(120) COLLATE pg_catalog."default" NOT NULL,
+    description character varying(360) COLLATE pg_catalog."default" NOT NULL,
+    image_path character varying(256) COLLATE pg_catalog."default" NOT NULL,
+    date date NOT NULL DEFAULT CURRENT_DATE,
+    url character varying(512) COLLATE pg_catalog."default",
+    CONSTRAINT olympiads_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.offices
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    office character varying(16) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT offices_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.news_achievements
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(120) COLLATE pg_catalog."default" NOT NULL,
+    description character varying(360) COLLATE pg_catalog."default" NOT NULL,
+    image_path character varying(256) COLLATE pg_catalog."default" NOT NULL,
+    date date NOT NULL DEFAULT CURRENT_DATE,
+    url character varying(512) COLLATE pg_catalog."default",
+    CONSTRAINT news_achievements_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.new_email
+(
+    token character varying(32) COLLATE pg_catalog."default" NOT NULL,
+    user_id bigint NOT NULL,
+    new_email character varying(256) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT user_id FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS public.lessons
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(20) COLLATE pg_catalog."default" NOT NULL,
+    day_number integer NOT NULL,
+    lesson_number integer NOT NULL,
+    classrooms integer[],
+    teachers character varying(32)[] COLLATE pg_catalog."default",
+    class_number integer NOT NULL,
+    class_letter character varying(1) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT schedule_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.lesson_time
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    day_number integer NOT NULL,
+    start_time character varying(5) COLLATE pg_catalog."default" NOT NULL,
+    stop_time character varying(5) COLLATE pg_catalog."default" NOT NULL,
+    lesson_number integer NOT NULL,
+    CONSTRAINT lesson_time_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.lesson_time_special
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    date date NOT NULL,
+    lesson_number integer NOT NULL,
+    start_time character varying(5) COLLATE pg_catalog."default" NOT NULL,
+    stop_time character varying(5) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT lesson_time_special_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.lesson_substitutions
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    date date NOT NULL,
+    title character varying(20) COLLATE pg_catalog."default" NOT NULL,
+    lesson_number integer NOT NULL,
+    classrooms integer[],
+    teachers character varying[] COLLATE pg_catalog."default",
+    class_number integer NOT NULL,
+    class_letter character varying(1) COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT lesson_substitutions_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.events
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    title character varying(120) COLLATE pg_catalog."default" NOT NULL,
+    description character varying(360) COLLATE pg_catalog."default" NOT NULL,
+    image_path character varying(256) COLLATE pg_catalog."default" NOT NULL,
+    date date NOT NULL DEFAULT CURRENT_DATE,
+    url character varying(512) COLLATE pg_catalog."default",
+    CONSTRAINT events_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.clubs
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 99999999999999 CACHE 1 ),
+    title character varying(32) COLLATE pg_catalog."default" NOT NULL,
+    description character varying(200) COLLATE pg_catalog."default" NOT NULL,
+    image_path character varying(100) COLLATE pg_catalog."default",
+    telegram_url character varying(120) COLLATE pg_catalog."default" DEFAULT NULL::character varying,
+    administration integer NOT NULL,
+    xp integer NOT NULL DEFAULT 0,
+    max_members_counts integer DEFAULT 0,
+    class_limit_min integer DEFAULT 1,
+    class_limit_max integer DEFAULT 11,
+    CONSTRAINT clubs_pkey PRIMARY KEY (id),
+    CONSTRAINT title UNIQUE (title),
+    CONSTRAINT administration FOREIGN KEY (administration)
+        REFERENCES public.administrations (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE NO ACTION
+)""",
+        """CREATE TABLE IF NOT EXISTS public.club_members
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 9999999999999 CACHE 1 ),
+    user_id bigint NOT NULL,
+    club_id bigint NOT NULL,
+    admin boolean NOT NULL DEFAULT false,
+    CONSTRAINT club_members_pkey PRIMARY KEY (id),
+    CONSTRAINT club_id FOREIGN KEY (club_id)
+        REFERENCES public.clubs (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE,
+    CONSTRAINT user_id FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE CASCADE
+        ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS public.auth_tokens
+(
+    token character varying(32) COLLATE pg_catalog."default" NOT NULL,
+    user_id bigint NOT NULL,
+    CONSTRAINT auth_tokens_pkey PRIMARY KEY (token),
+    CONSTRAINT auth_tokens_user_id_fkey FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)""",
+        """CREATE TABLE IF NOT EXISTS public.achievements
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 9999999999999999 CACHE 1 ),
+    global boolean NOT NULL DEFAULT true,
+    title character varying(20) COLLATE pg_catalog."default" NOT NULL,
+    description character varying(120) COLLATE pg_catalog."default" NOT NULL,
+    xp integer NOT NULL DEFAULT 0,
+    CONSTRAINT achievements_pkey PRIMARY KEY (id)
+)""",
+        """CREATE TABLE IF NOT EXISTS public.new_password_wait
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY ( INCREMENT 1 START 1 MINVALUE 1 MAXVALUE 999999999999999999 CACHE 1 ),
+    user_id bigint NOT NULL,
+    new_password text COLLATE pg_catalog."default" NOT NULL,
+    CONSTRAINT new_password_wait_pkey PRIMARY KEY (id),
+    CONSTRAINT user_id FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE NO ACTION
+)""",
+    ]),
+    Migration(2, "Удаление повторных записей в club_members", [
+        """DELETE FROM public.club_members a
+    USING public.club_members b
+    WHERE a.user_id = b.user_id AND a.club_id = b.club_id AND a.id > b.id""",
+    ]),
+    Migration(3, "Индексы для частых выборок", [
+        Index("club_members_user_club_key", "club_members", "(user_id, club_id)", unique=True),
+        Index("club_members_club_id_idx", "club_members", "(club_id)"),
+        Index("lessons_day_class_idx", "lessons", "(day_number, class_number, class_letter)"),
+        Index("lesson_substitutions_date_class_idx", "lesson_substitutions", "(date, class_number, class_letter)"),
+        Index("lesson_time_day_idx", "lesson_time", "(day_number)"),
+        Index("lesson_time_special_date_idx", "lesson_time_special", "(date)"),
+        Index("users_login_idx", "users", "(login)"),
+        Index("tokens_user_id_idx", "tokens", "(user_id)"),
+        Index("new_email_token_key", "new_email", "(token)", unique=True),
+        Index("new_email_user_id_idx", "new_email", "(user_id)"),
+    ]),
+    Migration(4, "Ограничения на основе построенных индексов", [
+        """DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'club_members_user_club_key') THEN
+        ALTER TABLE public.club_members
+            ADD CONSTRAINT club_members_user_club_key UNIQUE USING INDEX club_members_user_club_key;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'new_email_token_key') THEN
+        ALTER TABLE public.new_email
+            ADD CONSTRAINT new_email_token_key UNIQUE USING INDEX new_email_token_key;
+    END IF;
+END $$""",
+    ]),
+    Migration(5, "Список отзыва access-токенов", [
+        """CREATE TABLE IF NOT EXISTS public.token_revocations
+(
+    user_id bigint NOT NULL,
+    revoked_at timestamp with time zone NOT NULL,
+    CONSTRAINT token_revocations_pkey PRIMARY KEY (user_id),
+    CONSTRAINT token_revocations_user_id_fkey FOREIGN KEY (user_id)
+        REFERENCES public.users (id) MATCH SIMPLE
+        ON UPDATE NO ACTION
+        ON DELETE CASCADE
+)""",
+    ]),
+    # Срок жизни задаётся значением по умолчанию: строки auth_tokens вставляет Telegram-бот
+    Migration(6, "Срок действия токенов и запросов подтверждения", [
+        """ALTER TABLE public.tokens
+    ADD COLUMN IF NOT EXISTS created_at timestamp with time zone NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS expires_at timestamp with time zone NOT NULL DEFAULT now() + interval '180 days'""",
+        """ALTER TABLE public.auth_tokens
+    ADD COLUMN IF NOT EXISTS created_at timestamp with time zone NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS expires_at timestamp with time zone NOT NULL DEFAULT now() + interval '10 minutes'""",
+        """ALTER TABLE public.new_password_wait
+    ADD COLUMN IF NOT EXISTS created_at timestamp with time zone NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS expires_at timestamp with time zone NOT NULL DEFAULT now() + interval '1 day'""",
+        """ALTER TABLE public.new_email
+    ADD COLUMN IF NOT EXISTS created_at timestamp with time zone NOT NULL DEFAULT now(),
+    ADD COLUMN IF NOT EXISTS expires_at timestamp with time zone NOT NULL DEFAULT now() + interval '1 day'""",
+    ]),
+    Migration(7, "Индексы для удаления просроченных строк", [
+        Index("tokens_expires_at_idx", "tokens", "(expires_at)"),
+        Index("auth_tokens_expires_at_idx", "auth_tokens", "(expires_at)"),
+        Index("new_password_wait_expires_at_idx", "new_password_wait", "(expires_at)"),
+        Index("new_email_expires_at_idx", "new_email", "(expires_at)"),
+    ]),
+    Migration(8, "Уведомление о входе через Telegram (NOTIFY auth_tokens)", [
+        """CREATE OR REPLACE FUNCTION public.notify_auth_token() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('auth_tokens', NEW.token);
+    RETURN NEW;
+END $$""",
+        """DROP TRIGGER IF EXISTS auth_tokens_notify ON public.auth_tokens""",
+        """CREATE TRIGGER auth_tokens_notify AFTER INSERT ON public.auth_tokens
+    FOR EACH ROW EXECUTE FUNCTION public.notify_auth_token()""",
+    ]),
+    Migration(9, "Уникальность логина и почты без учёта регистра", [
+        """DO $$
+DECLARE
+    duplicates text;
+BEGIN
+    SELECT string_agg(value, ', ') INTO duplicates FROM (
+        SELECT lower(login) AS value FROM public.users GROUP BY 1 HAVING count(*) > 1
+        UNION ALL
+        SELECT lower(email) FROM public.users WHERE email IS NOT NULL GROUP BY 1 HAVING count(*) > 1
+    ) d;
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'Логины или почты совпадают без учёта регистра, исправьте вручную: %', duplicates;
+    END IF;
+END $$""",
+        Index("users_lower_login_key", "users", "(lower(login))", unique=True),
+        Index("users_lower_email_key", "users", "(lower(email))", unique=True),
+        "DROP INDEX CONCURRENTLY IF EXISTS public.users_login_idx",
+    ]),
+    Migration(10, "Outbox уведомлений", [
+        """CREATE TABLE IF NOT EXISTS public.outbox
+(
+    id bigint NOT NULL GENERATED ALWAYS AS IDENTITY,
+    kind text NOT NULL,
+    payload jsonb NOT NULL,
+    status text NOT NULL DEFAULT 'pending',
+    attempts integer NOT NULL DEFAULT 0,
+    available_at timestamp with time zone NOT NULL DEFAULT now(),
+    last_error text,
+    created_at timestamp with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT outbox_pkey PRIMARY KEY (id),
+    CONSTRAINT outbox_status_check CHECK (status IN ('pending', 'dead'))
+)""",
+        """CREATE INDEX IF NOT EXISTS outbox_pending_idx ON public.outbox (available_at) WHERE status = 'pending'""",
+        """CREATE OR REPLACE FUNCTION public.notify_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('outbox', '');
+    RETURN NULL;
+END $$""",
+        """DROP TRIGGER IF EXISTS outbox_notify ON public.outbox""",
+        """CREATE TRIGGER outbox_notify AFTER INSERT ON public.outbox
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_outbox()""",
+    ]),
+    Migration(11, "Приоритет уведомлений outbox (рассылки после одиночных)", [
+        "ALTER TABLE public.outbox ADD COLUMN IF NOT EXISTS priority smallint NOT NULL DEFAULT 0",
+        Index("outbox_priority_idx", "outbox", "(priority DESC, available_at) WHERE status = 'pending'"),
+        "DROP INDEX CONCURRENTLY IF EXISTS public.outbox_pending_idx",
+    ]),
+    Migration(12, "Уведомление об изменении расписания (NOTIFY timetable)", [
+        """CREATE OR REPLACE FUNCTION public.notify_timetable() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('timetable', TG_TABLE_NAME);
+    RETURN NULL;
+END $$""",
+        """DROP TRIGGER IF EXISTS lessons_notify ON public.lessons""",
+        """CREATE TRIGGER lessons_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.lessons
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_timetable()""",
+        """DROP TRIGGER IF EXISTS lesson_time_notify ON public.lesson_time""",
+        """CREATE TRIGGER lesson_time_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.lesson_time
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_timetable()""",
+        """DROP TRIGGER IF EXISTS lesson_time_special_notify ON public.lesson_time_special""",
+        """CREATE TRIGGER lesson_time_special_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.lesson_time_special
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_timetable()""",
+        """DROP TRIGGER IF EXISTS lesson_substitutions_notify ON public.lesson_substitutions""",
+        """CREATE TRIGGER lesson_substitutions_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.lesson_substitutions
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_timetable()""",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def current_version(connection: Connection) -> int:
+    """Текущая версия схемы, 0 - если миграции ещё не применялись"""
+    if not await connection.fetchval("SELECT to_regclass('public.schema_version') IS NOT NULL"):
+        return 0
+    return await connection.fetchval("SELECT coalesce(max(version), 0) FROM public.schema_version")
+
+
+async def _create_index(connection: Connection, index: Index) -> None:
+    """Построение индекса; недостроенный (INVALID) индекс после сбоя пересоздаётся"""
+    valid = await connection.fetchval(
+        """SELECT i.indisvalid FROM pg_class c
+           JOIN pg_index i ON i.indexrelid = c.oid
+           WHERE c.relname = $1 AND c.relnamespace = 'public'::regnamespace""",
+        index.name)
+    if valid is False:
+        logger.warning(f"Индекс {index.name} недостроен, пересоздание")
+        await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS public.{index.name}")
+    await connection.execute(index.sql())
+
+
+async def _apply(connection: Connection, migration: Migration) -> None:
+    mark = "INSERT INTO public.schema_version (version, description) VALUES ($1, $2)"
+    if migration.concurrent:
+        for statement in migration.statements:
+            if isinstance(statement, Index):
+                await _create_index(connection, statement)
+            else:
+                await connection.execute(statement)
+        await connection.execute(mark, migration.version, migration.description)
+    else:
+        async with connection.transaction():
+            for statement in migration.statements:
+                await connection.execute(statement)
+            await connection.execute(mark, migration.version, migration.description)
+
+
+async def migrate() -> int:
+    """Проверка версии схемы и применение недостающих миграций
+
+    :return: Версия схемы после миграций
+    """
+    async with Database(autocommit=True) as db:
+        connection = db.connection
+        version = await current_version(connection)
+        if version >= LATEST_VERSION:
+            logger.info(f"Схема БД актуальна (версия {version})")
+            return version
+
+        await connection.execute("SELECT pg_advisory_lock($1)", SCHEMA_LOCK_KEY)
+        try:
+            await connection.execute("""CREATE TABLE IF NOT EXISTS public.schema_version
+(
+    version integer NOT NULL,
+    description text NOT NULL,
+    applied_at timestamp with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT schema_version_pkey PRIMARY KEY (version)
+)""")
+            # Другой процесс мог применить миграции, пока мы ждали блокировку
+            version = await current_version(connection)
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                logger.info(f"Миграция схемы БД {migration.version}: {migration.description}")
+                try:
+                    await _apply(connection, migration)
+                except Exception as e:
+                    logger.error(f"Ошибка миграции {migration.version}: {e}")
+                    raise
+                version = migration.version
+        finally:
+            await connection.execute("SELECT pg_advisory_unlock($1)", SCHEMA_LOCK_KEY)
+
+    logger.info(f"Схема БД обновлена до версии {version}")
+    return version
@@ -0,0 +1,181 @@
+"""Transactional outbox: уведомления (письма, сообщения в Telegram) из обработчиков запросов.
+
+Обработчик записывает уведомление в таблицу outbox той же транзакцией, что и остальные
+изменения (add), и сразу отвечает клиенту - медленный SMTP или Telegram не удлиняют ни
+ответ, ни транзакцию, а при откате транзакции уведомление не уходит.
+
+Фоновый диспетчер забирает готовые строки (FOR UPDATE SKIP LOCKED, поэтому несколько
+процессов сервера не получат одну строку) и отправляет их не более чем по
+OUTBOX_CONCURRENCY одновременно. Забранная строка откладывается на время аренды: если
+процесс упадёт во время отправки, её повторит другой. Успешно отправленная строка
+удаляется, неудачная - повторяется с экспоненциальной задержкой, а после
+OUTBOX_MAX_ATTEMPTS попыток или постоянной ошибки получает статус dead и остаётся
+в таблице для разбора. Новые строки будят диспетчер через NOTIFY outbox.
+Строки с большим priority забираются раньше: массовые рассылки (BULK_PRIORITY) не
+задерживают одиночные письма и сообщения.
+
+Отправка по виду уведомления регистрируется через register(kind, handler).
+"""
+import asyncio
+import json
+import math
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from config import (logger, OUTBOX_CONCURRENCY, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS,
+                    OUTBOX_SEND_TIMEOUT, OUTBOX_POLL_INTERVAL)
+from database import listener
+from database.database import Database
+from database.metrics import StatementStats
+from database.queries import Q
+
+BULK_PRIORITY = -1  # приоритет массовых рассылок
+
+# Аренда забранной строки: исходы пишутся после отправки всей пачки, а пачка отправляется
+# волнами по OUTBOX_CONCURRENCY, каждая не дольше OUTBOX_SEND_TIMEOUT; ещё одна волна - запас
+# на запись исходов. Раньше срока аренды другой процесс строку не заберёт и повторно не отправит
+LEASE = (math.ceil(OUTBOX_BATCH_SIZE / OUTBOX_CONCURRENCY) + 1) * OUTBOX_SEND_TIMEOUT
+
+# handler(payload) - отправка; исключение означает неудачную попытку
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Retry(Exception):
+    """Отложить не меньше чем на after секунд (например, Telegram RetryAfter); попытка не засчитывается"""
+
+    def __init__(self, after: float, reason: str = ""):
+        super().__init__(reason or f"retry after {after} s")
+        self.after = after
+
+
+class Permanent(Exception):
+    """Повторять бессмысленно (адрес не существует, бот заблокирован) - сразу dead"""
+
+
+_handlers: Dict[str, Handler] = {}
+_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+_latency = StatementStats()  # время одной отправки, мс
+_counters = {"added": 0, "sent": 0, "retried": 0, "postponed": 0, "dead": 0}
+
+
+def register(kind: str, handler: Handler) -> None:
+    """Отправка уведомлений вида kind; вызывается при импорте модуля-отправителя"""
+    _handlers[kind] = handler
+
+
+async def add(db: Database, kind: str, payload: dict) -> Optional[int]:
+    """Запись уведомления в транзакции db
+
+    :return: id строки или None, если запись не удалась (ошибка в db.last_error)
+    """
+    result = await db.fetchval(Q.outbox_insert, (kind, json.dumps(payload, ensure_ascii=False)))
+    if result is not None:
+        _counters["added"] += 1
+    return result
+
+
+def _backoff(attempts: int) -> float:
+    return min(2 ** attempts * 5, 3600)
+
+
+async def _send(row: dict, semaphore: asyncio.Semaphore) -> tuple:
+    """Одна отправка; результат - (запрос, параметры) для записи исхода"""
+    kind, attempts = row["kind"], row["attempts"]
+    handler = _handlers.get(kind)
+    try:
+        if handler is None:
+            raise Permanent(f"нет обработчика для {kind}")
+        async with semaphore:
+            started = time.perf_counter()
+            await asyncio.wait_for(handler(json.loads(row["payload"])), OUTBOX_SEND_TIMEOUT)
+            _latency.add((time.perf_counter() - started) * 1000, None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if isinstance(e, Retry):
+            _counters["postponed"] += 1
+            return Q.outbox_postpone, (row["id"], float(e.after))
+        error = f"{e.__class__.__name__}: {e}"
+        if isinstance(e, Permanent) or attempts >= OUTBOX_MAX_ATTEMPTS:
+            _counters["dead"] += 1
+            logger.error(f"Уведомление outbox {row['id']} ({kind}) не отправлено после {attempts} попыток: {error}")
+            return Q.outbox_dead, (row["id"], error)
+        delay = _backoff(attempts)
+        _counters["retried"] += 1
+        logger.warning(f"Попытка {attempts}: ошибка отправки уведомления outbox {row['id']} ({kind}) - {error}, "
+                       f"повтор через {delay} с")
+        return Q.outbox_retry, (row["id"], float(delay), error)
+    _counters["sent"] += 1
+    return Q.outbox_done, (row["id"],)
+
+
+async def dispatch() -> int:
+    """Один проход: забрать готовые строки, отправить, записать исходы
+
+    :return: Число забранных строк
+    """
+    async with Database(autocommit=True) as db:
+        rows = await db.execute_all(Q.outbox_claim, (OUTBOX_BATCH_SIZE, LEASE))
+    if not rows:
+        return 0
+    semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+    outcomes = await asyncio.gather(*(_send(row, semaphore) for row in rows))
+    # Каждый исход - отдельный запрос в autocommit: ошибка записи одного исхода не откатывает
+    # удаление уже доставленных строк (иначе они были бы отправлены повторно)
+    async with Database(autocommit=True) as db:
+        for sql, params in outcomes:
+            await db.execute(sql, params)
+    return len(rows)
+
+
+def _wake(payload: str) -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+listener.subscribe("outbox", _wake)
+
+
+async def _run() -> None:
+    while True:
+        _wakeup.clear()
+        try:
+            claimed = await dispatch()
+        except Exception as e:
+            logger.warning(f"Ошибка обработки outbox: {e}")
+            claimed = 0
+        if claimed >= OUTBOX_BATCH_SIZE:
+            continue  # в таблице, вероятно, есть ещё готовые строки
+        try:
+            await asyncio.wait_for(_wakeup.wait(), OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "send_avg_ms": round(_latency.total_ms / _latency.calls, 1) if _latency.calls else 0.0,
+        "send_p95_ms": _latency.percentile(0.95),
+        "send_max_ms": round(_latency.max_ms, 1),
+    }
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: запуск диспетчера outbox"""
+    global _task, _wakeup
+    _wakeup = asyncio.Event()
+    _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def on_cleanup(app) -> None:
+    """aiohttp on_cleanup: остановка диспетчера; недоставленное останется в таблице"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    logger.info(f"Outbox: {stats()}")
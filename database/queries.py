@@ -0,0 +1,196 @@
+"""Реестр именованных SQL-запросов приложения.
+
+Все запросы обработчиков собраны здесь, чтобы их можно было просмотреть в одном месте.
+Database выполняет их по имени: текст запроса одинаков для всех вызовов, поэтому
+каждое соединение пула готовит (PREPARE) его один раз и дальше берёт из своего
+кеша подготовленных выражений. Время выполнения запросов считает database.metrics по имени запроса.
+"""
+import re
+from typing import Dict, Optional
+
+_RETURNING = re.compile(r"\breturning\b", re.IGNORECASE)
+
+
+class Query:
+    """Именованный SQL-запрос"""
+
+    __slots__ = ("name", "sql", "is_select", "returns_rows", "_json")
+
+    def __init__(self, sql: str, name: str = ""):
+        self.name = ""
+        self.sql = sql
+        self.is_select = sql.strip().lower().startswith('select')
+        self.returns_rows = self.is_select or _has_returning(sql)  # SELECT или INSERT/UPDATE/DELETE ... RETURNING
+        self._json: Optional["Query"] = None
+        if name:
+            self.__set_name__(None, name)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        _registry[name] = self
+
+    def __str__(self) -> str:
+        return self.sql
+
+    def __repr__(self) -> str:
+        return f"<Query {self.name}>"
+
+    def as_json(self) -> "Query":
+        """Тот же запрос, но возвращающий весь результат одним JSON-массивом"""
+        if self._json is None:
+            self._json = json_query(self.sql, f"{self.name}__json")
+        return self._json
+
+
+_registry: Dict[str, Query] = {}
+
+
+def _has_returning(sql: str) -> bool:
+    """INSERT/UPDATE/DELETE ... RETURNING возвращает строки, как SELECT"""
+    return _RETURNING.search(sql) is not None
+
+
+def json_query(sql: str, name: str = "") -> Query:
+    """Оборачивает SELECT так, чтобы PostgreSQL сам собрал результат в JSON-массив.
+    Даты отдаются строками YYYY-MM-DD, numeric - числами"""
+    return Query(f"SELECT coalesce(json_agg(q), '[]'::json)::text FROM ({sql}) q", name)
+
+
+class Q:
+    """Именованные запросы: Q.club_members_count, Q.check_token и т.д."""
+
+    # --- Токены и авторизация ---
+    check_token = Query("""SELECT t.user_id, u.class_number, u.class_letter, u.login
+                           FROM tokens t JOIN users u ON u.id = t.user_id
+                           WHERE t.token = $1 AND t.expires_at > now()""")
+    token_insert = Query("INSERT INTO tokens (user_id, token) VALUES ($1, $2)")
+    tokens_delete_user = Query("DELETE FROM tokens WHERE user_id = $1")
+    auth_user_by_email = Query("""SELECT id AS user_id, class_number, class_letter, login, password FROM users
+                                  WHERE lower(email) = lower($1)""")
+    auth_user_by_login = Query("""SELECT id AS user_id, class_number, class_letter, login, password FROM users
+                                  WHERE lower(login) = lower($1)""")
+    auth_token_user = Query("""SELECT a.user_id, u.class_number, u.class_letter, u.login
+                               FROM auth_tokens a JOIN users u ON u.id = a.user_id
+                               WHERE a.token = $1 AND a.expires_at > now()""")
+    revocation_set = Query("""INSERT INTO token_revocations (user_id, revoked_at) VALUES ($1, $2)
+                              ON CONFLICT (user_id) DO UPDATE SET revoked_at = GREATEST(token_revocations.revoked_at, EXCLUDED.revoked_at)""")
+    revocations_since = Query("SELECT user_id, revoked_at FROM token_revocations WHERE revoked_at > $1")
+
+    # --- Пользователи ---
+    user_verify_email = Query("UPDATE users SET verified=true WHERE email=$1")
+    user_by_email = Query("SELECT id, email, telegram_id FROM users WHERE lower(email) = lower($1)")
+    user_by_login = Query("SELECT id, email, telegram_id FROM users WHERE lower(login) = lower($1)")
+    user_profile = Query("SELECT login, email, name, surname, class_number, class_letter, telegram_id FROM users WHERE id=$1")
+    user_login_exists = Query("SELECT 1 FROM users WHERE lower(login) = lower($1) AND id <> $2")
+    user_email_exists = Query("SELECT 1 FROM users WHERE lower(email) = lower($1)")
+    user_password = Query("SELECT password FROM users WHERE id=$1")
+    user_set_login = Query("UPDATE users SET login=$2 WHERE id=$1")
+    user_set_email = Query("UPDATE users SET email=$1 WHERE id=$2")
+    user_set_password = Query("UPDATE users SET password=$2 WHERE id=$1")
+    user_rehash_password = Query("UPDATE users SET password=$3 WHERE id=$1 AND password=$2")
+    user_telegram_out = Query("UPDATE users SET telegram_id=NULL WHERE id=$1")
+    users_telegram_active = Query("""SELECT DISTINCT u.telegram_id FROM users u JOIN tokens t ON t.user_id = u.id
+                                     WHERE u.telegram_id IS NOT NULL AND t.expires_at > now() LIMIT $1""")
+
+    # --- Смена пароля и почты ---
+    new_password_insert = Query("INSERT INTO new_password_wait (user_id, new_password) VALUES ($1, $2) RETURNING id")
+    new_password_get = Query("SELECT user_id, new_password FROM new_password_wait WHERE id = $1 AND expires_at > now()")
+    new_password_delete = Query("DELETE FROM new_password_wait WHERE id=$1")
+    new_email_get = Query("SELECT user_id, new_email FROM new_email WHERE token = $1 AND expires_at > now()")
+    new_email_delete = Query("DELETE FROM new_email WHERE token=$1")
+    new_email_delete_user = Query("DELETE FROM new_email WHERE user_id = $1")
+    new_email_insert = Query("INSERT INTO new_email (token, user_id, new_email) VALUES ($1, $2, $3)")
+
+    # --- Outbox ---
+    outbox_insert = Query("INSERT INTO outbox (kind, payload) VALUES ($1, $2::jsonb) RETURNING id")
+    outbox_claim = Query("""UPDATE outbox SET attempts = attempts + 1, available_at = now() + make_interval(secs => $2)
+                            WHERE id IN (SELECT id FROM outbox WHERE status = 'pending' AND available_at <= now()
+                                         ORDER BY priority DESC, available_at LIMIT $1 FOR UPDATE SKIP LOCKED)
+                            RETURNING id, kind, payload::text AS payload, attempts""")
+    outbox_done = Query("DELETE FROM outbox WHERE id = $1")
+    outbox_retry = Query("UPDATE outbox SET available_at = now() + make_interval(secs => $2), last_error = $3 WHERE id = $1")
+    outbox_postpone = Query("UPDATE outbox SET available_at = now() + make_interval(secs => $2), attempts = attempts - 1 WHERE id = $1")
+    outbox_dead = Query("UPDATE outbox SET status = 'dead', last_error = $2 WHERE id = $1")
+    outbox_notify_class = Query("""INSERT INTO outbox (kind, payload, priority)
+                                   SELECT 'telegram', jsonb_build_object('chat_id', telegram_id, 'text', $3::text, 'broadcast', $4::text), $5
+                                   FROM users WHERE class_number = $1 AND class_letter = $2 AND telegram_id IS NOT NULL""")
+    outbox_notify_club = Query("""INSERT INTO outbox (kind, payload, priority)
+                                  SELECT 'telegram', jsonb_build_object('chat_id', u.telegram_id, 'text', $2::text, 'broadcast', $3::text), $4
+                                  FROM club_members m JOIN users u ON u.id = m.user_id
+                                  WHERE m.club_id = $1 AND u.telegram_id IS NOT NULL""")
+    outbox_broadcast_progress = Query("""SELECT status, count(*) AS count FROM outbox
+                                         WHERE payload->>'broadcast' = $1 GROUP BY status""")
+
+    # --- Расписание ---
+    timetable_bells = Query("SELECT day_number, lesson_number, start_time, stop_time FROM lesson_time ORDER BY day_number, lesson_number, id")
+    timetable_lessons = Query("""SELECT class_number, class_letter, day_number, lesson_number, title, classrooms, teachers
+                                 FROM lessons ORDER BY id""")
+    timetable_bells_special = Query("SELECT lesson_number, start_time, stop_time FROM lesson_time_special WHERE date = $1 ORDER BY id")
+    timetable_substitutions = Query("""SELECT class_number, class_letter, lesson_number, title, classrooms, teachers
+                                       FROM lesson_substitutions WHERE date = $1 ORDER BY id""")
+
+    # --- Клубы ---
+    clubs_all = Query("""SELECT c.id, c.title, c.max_members_counts,
+                          c.class_limit_min, c.class_limit_max,
+                          (SELECT COUNT(*) FROM club_members m WHERE m.club_id = c.id) AS members_count
+                    FROM clubs c
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM club_members
+                        WHERE club_id = c.id AND user_id = $1
+                    )
+                    LIMIT $2 OFFSET $3""")
+    clubs_my = Query("""SELECT c.id, c.title, c.max_members_counts,
+                          c.class_limit_min, c.class_limit_max,
+                          (SELECT COUNT(*) FROM club_members m WHERE m.club_id = c.id) AS members_count
+                    FROM clubs c
+                    INNER JOIN club_members cm ON c.id = cm.club_id
+                    WHERE cm.user_id = $1
+                    LIMIT $2 OFFSET $3""")
+    clubs_top = Query("""SELECT c.id, c.title, c.max_members_counts,
+                          c.class_limit_min, c.class_limit_max, c.xp,
+                          (SELECT COUNT(*) FROM club_members m WHERE m.club_id = c.id) AS members_count
+                    FROM clubs c
+                    ORDER BY c.xp DESC
+                    LIMIT $1 OFFSET $2""")
+    club_by_id = Query("SELECT * FROM clubs WHERE id = $1")
+    club_by_title = Query("SELECT * FROM clubs WHERE title = $1")
+    club_title_exists = Query("SELECT 1 FROM clubs WHERE title = $1")
+    club_insert = Query("INSERT INTO clubs (title, description, administration, max_members_counts, class_limit_min, class_limit_max, telegram_url) VALUES ($1, $2, $3, $4, $5, $6, $7)")
+    club_delete = Query("DELETE FROM clubs WHERE id=$1")
+    club_max_members = Query("SELECT max_members_counts FROM clubs WHERE id = $1")
+    club_xp = Query("SELECT xp FROM clubs WHERE id=$1")
+    clubs_total_xp = Query("SELECT SUM(xp) AS total_xp FROM clubs")
+    club_set_title = Query("UPDATE clubs SET title=$2 WHERE id=$1")
+    club_set_description = Query("UPDATE clubs SET description=$2 WHERE id=$1")
+    club_set_max_members = Query("UPDATE clubs SET max_members_counts=$2 WHERE id=$1")
+    club_set_class_limit_min = Query("UPDATE clubs SET class_limit_min=$2 WHERE id=$1")
+    club_set_class_limit_max = Query("UPDATE clubs SET class_limit_max=$2 WHERE id=$1")
+    club_set_telegram_url = Query("UPDATE clubs SET telegram_url=$2 WHERE id=$1")
+
+    # --- Участники клубов ---
+    club_members_count = Query("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1")
+    club_admins_count = Query("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1 AND admin=true")
+    club_member = Query("SELECT * FROM club_members WHERE user_id=$1 AND club_id=$2")
+    club_member_exists = Query("SELECT 1 FROM club_members WHERE user_id=$1 AND club_id=$2")
+    club_member_is_admin = Query("SELECT 1 FROM club_members WHERE user_id=$1 AND club_id=$2 AND admin=true")
+    club_member_insert = Query("INSERT INTO club_members (club_id, user_id) VALUES ($2, $1)")
+    club_member_insert_admin = Query("INSERT INTO club_members (club_id, user_id, admin) VALUES ($2, $1, $3)")
+    club_member_delete = Query("DELETE FROM club_members WHERE user_id=$1 AND club_id=$2")
+
+    # --- Справочники ---
+    administrations = Query("SELECT * FROM administrations")
+    administration_title = Query("SELECT title FROM administrations WHERE id = $1")
+    achievements_global = Query("SELECT title, description, xp FROM achievements WHERE global=true")
+    achievements_local = Query("SELECT title, description, xp FROM achievements WHERE global=false")
+    teachers = Query("SELECT name, subject FROM teachers")
+    subject_title = Query("SELECT title FROM subjects WHERE id=$1")
+
+    # --- Новости ---
+    news_achievements = Query("SELECT title, description, image_path, date, url FROM news_achievements ORDER BY date DESC LIMIT 20")
+    news_events = Query("SELECT title, description, image_path, date, url FROM events ORDER BY date DESC LIMIT 20")
+    news_olympiads = Query("SELECT title, description, image_path, date, url FROM olympiads ORDER BY date DESC LIMIT 20")
+
+
+def count() -> int:
+    """Количество запросов в реестре"""
+    return len(_registry)
@@ -0,0 +1,79 @@
+"""Фоновое удаление просроченных токенов и запросов подтверждения.
+
+Строки удаляются пачками по SWEEP_BATCH_SIZE, каждая пачка - отдельная короткая транзакция
+с lock_timeout, а заблокированные другими транзакциями строки пропускаются (SKIP LOCKED),
+поэтому удаление не мешает авторизации. В нескольких процессах сервера одновременно
+работает только один проход - его защищает advisory lock.
+"""
+import asyncio
+from typing import Dict, Optional
+from config import logger, SWEEP_INTERVAL, SWEEP_BATCH_SIZE, SWEEP_LOCK_TIMEOUT_MS
+from database.database import Database
+
+SWEEP_LOCK_KEY = 724031502
+
+TABLES = ("tokens", "auth_tokens", "new_password_wait", "new_email")
+
+_task: Optional[asyncio.Task] = None
+
+
+async def _sweep_table(db: Database, table: str) -> int:
+    removed = 0
+    while True:
+        async with db.connection.transaction():
+            await db.execute(f"SET LOCAL lock_timeout = '{SWEEP_LOCK_TIMEOUT_MS}ms'")
+            count = await db.execute_rowcount(
+                f"""DELETE FROM public.{table} WHERE ctid IN (
+                        SELECT ctid FROM public.{table} WHERE expires_at < now()
+                        LIMIT $1 FOR UPDATE SKIP LOCKED)""",
+                (SWEEP_BATCH_SIZE,))
+        if count is None:  # ошибка уже записана в лог, остаток удалим в следующий проход
+            break
+        removed += count
+        if count < SWEEP_BATCH_SIZE:
+            break
+    return removed
+
+
+async def sweep() -> Optional[Dict[str, int]]:
+    """Один проход по всем таблицам
+
+    :return: Число удалённых строк по таблицам или None, если проход выполняет другой процесс
+    """
+    async with Database(autocommit=True) as db:
+        if not await db.connection.fetchval("SELECT pg_try_advisory_lock($1)", SWEEP_LOCK_KEY):
+            return None
+        try:
+            return {table: await _sweep_table(db, table) for table in TABLES}
+        finally:
+            await db.connection.execute("SELECT pg_advisory_unlock($1)", SWEEP_LOCK_KEY)
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            removed = await sweep()
+        except Exception as e:
+            logger.warning(f"Не удалось удалить просроченные строки: {e}")
+            continue
+        if removed and any(removed.values()):
+            logger.info("Удалены просроченные строки: " +
+                        ", ".join(f"{table} - {count}" for table, count in removed.items() if count))
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: запуск периодической очистки"""
+    global _task
+    _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def on_cleanup(app) -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -1,7 +1,12 @@
 from marshmallow import Schema, fields
 
 class TokenResponseSchema(Schema):
-    token = fields.Str(description="Токен для взаимодействия с аккаунтом")
+    token = fields.Str(description="Токен для взаимодействия с аккаунтом (он же refresh-токен)")
+    access_token = fields.Str(description="Короткоживущий подписанный токен (JWT) для заголовка Authorization")
+    expires_in = fields.Int(description="Время жизни access_token в секундах")
+
+class TokenRefreshSchema(Schema):
+    token = fields.Str(required=True, description="Refresh-токен, полученный при авторизации")
 
 class UserAuthSchema(Schema):
     identifier = fields.Str(required=True)
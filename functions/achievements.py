@@ -1,11 +1,9 @@
 from database.database import Database
+from database.queries import Q
 import json
 from datetime import date, datetime, timedelta
 from aiohttp import web
 
-async def get():
-    async with Database() as db:
-        result = await db.execute_all("SELECT title, description, image_path, date, url FROM news_achievements ORDER BY date DESC LIMIT 20")
-    for res in result:
-        res["date"] = str(res["date"])
-    return result
\ No newline at end of file
+async def get() -> bytes:
+    async with Database(readonly=True) as db:
+        return await db.fetch_json(Q.news_achievements)
\ No newline at end of file
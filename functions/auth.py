@@ -1,12 +1,19 @@
-from database.database import Database
+import asyncio
+from typing import Dict, Set
+from database.database import Database, release_request_connection
+from database import listener
+from database.queries import Q
+from database.functions import Principal, invalidate_token, invalidate_user
 from core import generate_unique_code
 from aiohttp import web
-import config
 from functions import mail
+from functions import telegram
+from functions import tokens
+from functions import passwords
 
 async def verify_email(email):
     async with Database() as db:
-        await db.execute("UPDATE users SET verified=true WHERE email=$1", (email,))
+        await db.execute(Q.user_verify_email, (email,))
 
 # async def register_user(email : str, password : str, first_name: str) -> str:
 #     """Регистрация нового пользователя в системе
@@ -35,52 +42,115 @@ async def verify_email(email):
 #         await db.execute("INSERT INTO tokens (email, token) VALUES ($1, $2)", (email, code,))
 #     return code
             
+def is_email(identifier: str) -> bool:
+    """Идентификатор входа - почта, если содержит @ (в логинах @ запрещён), иначе логин"""
+    return '@' in identifier
+
 async def auth(identifier:str, password:str) -> str:
-    async with Database() as db:
-        res = await db.execute("SELECT id FROM users WHERE (email = $1 or login = $1) AND password=$2", (identifier, password))
+    async with Database(readonly=True) as db:
+        res = await db.execute(Q.auth_user_by_email if is_email(identifier) else Q.auth_user_by_login, (identifier,))
+    await release_request_connection()  # не держим соединение пула, пока считается хеш
+    try:
         if not res:
+            await passwords.dummy_verify(password)
             return web.Response(status=401, text="The login information is incorrect")
-        user_id = res["id"]
-        code = generate_unique_code()
-        await db.execute("INSERT INTO tokens (user_id, token) VALUES ($1, $2)", (user_id, code,))
-    return web.json_response({"token": code}, status=200)
+        if not await passwords.verify_password(password, res["password"]):
+            if not passwords.is_hashed(res["password"]):
+                await passwords.dummy_verify(password)  # открытый текст сравнивается мгновенно
+            return web.Response(status=401, text="The login information is incorrect")
+        rehashed = None
+        if passwords.needs_rehash(res["password"]):
+            rehashed = await passwords.hash_password(password)
+    except passwords.HashQueueFull as e:
+        return e.response()
+    user = Principal.from_row(res)
+    code = generate_unique_code()
+    async with Database() as db:
+        await db.execute(Q.token_insert, (user.id, code,))
+        if rehashed:
+            await db.execute(Q.user_rehash_password, (user.id, res["password"], rehashed))
+    return tokens.token_response(code, user)
 
 async def check_auth_token(token:str):
     async with Database() as db:
-        res = await db.execute("SELECT user_id FROM auth_tokens WHERE token = $1", (token,))
+        res = await db.execute(Q.auth_token_user, (token,))
         if not res:
             return web.Response(status=401)
-        await db.execute("INSERT INTO tokens (user_id, token) VALUES ($1, $2)", (res["user_id"], token,))
-    return web.json_response({"token": token}, status=200)
+        await db.execute(Q.token_insert, (res["user_id"], token,))
+    invalidate_token(token)  # токен мог попасть в кеш как неверный до подтверждения в Telegram
+    return tokens.token_response(token, Principal.from_row(res))
+
+# token -> ожидающие входа через Telegram запросы этого процесса
+_auth_waiters: Dict[str, Set[asyncio.Future]] = {}
+
+def _on_auth_token(token: str) -> None:
+    """NOTIFY auth_tokens: бот записал токен - будим ожидающие запросы"""
+    for waiter in _auth_waiters.pop(token, ()):
+        if not waiter.done():
+            waiter.set_result(True)
+
+listener.subscribe('auth_tokens', _on_auth_token)
+
+async def wait_auth_token(token: str, timeout: float) -> web.Response:
+    """Ожидание входа через Telegram в одном запросе вместо периодического опроса.
+    Токен проверяется сразу, затем по уведомлению из БД и последний раз по таймауту
+    (уведомление могло потеряться при переподключении LISTEN)"""
+    waiter = asyncio.get_running_loop().create_future()
+    _auth_waiters.setdefault(token, set()).add(waiter)  # до проверки, чтобы не пропустить уведомление
+    try:
+        res = await check_auth_token(token)
+        if res.status != 401:
+            return res
+        await release_request_connection()  # не держим соединение пула во время ожидания
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        return await check_auth_token(token)
+    finally:
+        waiters = _auth_waiters.get(token)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del _auth_waiters[token]
 
 async def forgot_password(identifier: str, new_password: str) -> web.Response:
+    try:
+        new_password = await passwords.hash_password(new_password)
+    except passwords.HashQueueFull as e:
+        return e.response()
     async with Database() as db:
-        res = await db.execute("SELECT id, email, telegram_id FROM users WHERE (email = $1 or login = $1)", (identifier,))
+        res = await db.execute(Q.user_by_email if is_email(identifier) else Q.user_by_login, (identifier,))
         if not res:
             return web.Response(status=401, text="The login information is incorrect")
         if not res["email"] and not res["telegram_id"]:
             return web.Response(status=422, text="Email and Telegram account are not linked to the user")
-        result = await db.fetchval("INSERT INTO new_password_wait (user_id, new_password) VALUES ($1, $2)", (res["id"], new_password,))
+        result = await db.fetchval(Q.new_password_insert, (res["id"], new_password,))
         if res["telegram_id"]:
-            await config.bot.send_message(res["telegram_id"], f"Вы запросили смену пароля. Если это были не вы, просто <b>проигнорируйте</b> это сообщение.\n\nЕсли это были вы, перейдите по ссылке ниже, чтобы подтвердить смену пароля:\nhttps://api.school-hub.ru/auth/forgot_password/confirm?confirm={result}")
+            await telegram.send_message(db, res["telegram_id"], f"Вы запросили смену пароля. Если это были не вы, просто <b>проигнорируйте</b> это сообщение.\n\nЕсли это были вы, перейдите по ссылке ниже, чтобы подтвердить смену пароля:\nhttps://api.school-hub.ru/auth/forgot_password/confirm?confirm={result}")
         if res["email"]:
-            await mail.send_password_edit(res["email"], f"https://api.school-hub.ru/auth/forgot_password/confirm?confirm={result}")
+            await mail.send_password_edit(db, res["email"], f"https://api.school-hub.ru/auth/forgot_password/confirm?confirm={result}")
+        if db.last_error is not None:  # транзакция откатится вместе с уведомлениями
+            return web.Response(status=500, text="Server-side error")
         return web.Response(status=204)
     
 async def forgot_password_confirm(confirm: int) -> web.Response:
     async with Database() as db:
-        res = await db.execute("SELECT user_id, new_password FROM new_password_wait WHERE id = $1", (confirm,))
+        res = await db.execute(Q.new_password_get, (confirm,))
         if not res:
             return web.Response(status=400, text="Invalid confirmation code")
-        await db.execute("UPDATE users SET password=$1 WHERE id=$2", (res["new_password"], res["user_id"],))
-        await db.execute("DELETE FROM new_password_wait WHERE id=$1", (confirm,))
-        return web.HTTPFound('/forgot_password/')
+        await db.execute(Q.user_set_password, (res["user_id"], res["new_password"],))
+        await db.execute(Q.new_password_delete, (confirm,))
+        await db.execute(Q.tokens_delete_user, (res["user_id"],))  # refresh-токены всех сессий
+    invalidate_user(res["user_id"])
+    await tokens.revoke_user(res["user_id"])
+    return web.HTTPFound('/forgot_password/')
     
 async def email_verify_confirm(token: str) -> web.Response:
     async with Database() as db:
-        res = await db.execute("SELECT user_id, new_email FROM new_email WHERE token = $1", (token,))
+        res = await db.execute(Q.new_email_get, (token,))
         if not res:
             return web.Response(status=400, text="Invalid confirmation code")
-        await db.execute("UPDATE users SET email=$1 WHERE id=$2", (res["new_email"], res["user_id"],))
-        await db.execute("DELETE FROM new_email WHERE token=$1", (token,))
+        await db.execute(Q.user_set_email, (res["new_email"], res["user_id"],))
+        await db.execute(Q.new_email_delete, (token,))
         return web.HTTPFound('/new_email/')
\ No newline at end of file
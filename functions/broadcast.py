@@ -0,0 +1,147 @@
+"""Отправка сообщений в Telegram с учётом лимитов Bot API и массовые рассылки.
+
+Все сообщения бота (одиночные из telegram.send_message и рассылки) доставляет диспетчер
+outbox (см. database/outbox.py), поэтому очередь хранится в БД и переживает перезапуск,
+а сообщения отправляются параллельно, не более OUTBOX_CONCURRENCY одновременно.
+
+Перед отправкой send() берёт жетон из двух корзин (token bucket): общей для бота
+(TELEGRAM_GLOBAL_RATE сообщений в секунду) и корзины чата (TELEGRAM_CHAT_RATE), поэтому
+рассылка идёт с максимальной разрешённой скоростью и не упирается в 429. Если Telegram
+всё же ответил RetryAfter, отправка приостанавливается для всех чатов на указанное время,
+а сообщение откладывается в outbox без траты попытки. Лимиты считаются в памяти процесса.
+
+notify_class / notify_club записывают рассылку одним INSERT ... SELECT в транзакции
+вызывающего кода с низким приоритетом - одиночные уведомления уходят раньше.
+Ход рассылки: progress(broadcast_id) по outbox и stats(). Ход рассылок этого процесса в памяти
+приблизительный (сообщения, доставленные другим процессом или исчерпавшие попытки, не учитываются),
+поэтому записи о нём ограничены по числу и времени жизни.
+"""
+import asyncio
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from cache import TTLCache, MISSING
+from config import logger, bot, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE
+from database import outbox
+from database.database import Database
+from database.metrics import StatementStats
+from database.queries import Q
+from ratelimit import Limit, TokenBucketLimiter
+
+# Без всплесков: сообщения идут равномерно, в любом окне в 1 с не больше rate
+_global = TokenBucketLimiter(Limit(1, 1 / TELEGRAM_GLOBAL_RATE))
+_per_chat = TokenBucketLimiter(Limit(1, 1 / TELEGRAM_CHAT_RATE))
+_paused_until = 0.0  # Telegram ответил RetryAfter - до этого времени не отправляем
+_latency = StatementStats()  # время запроса sendMessage, мс
+_counters = {"sent": 0, "failed": 0, "retry_after": 0, "throttled": 0}
+TRACK_TTL = 3600  # сколько помнить ход рассылки, секунды
+_broadcasts = TTLCache(1000, TRACK_TTL)  # broadcast_id -> ход рассылки, начатой этим процессом
+
+
+async def _acquire(chat_id: int) -> None:
+    """Ожидание жетонов: сначала чата, затем общего (жетон чата не тратится впустую, пока ждём общий)"""
+    throttled = False
+    while delay := _per_chat.hit(chat_id):
+        throttled = True
+        await asyncio.sleep(delay)
+    while delay := _global.hit(None):
+        throttled = True
+        await asyncio.sleep(delay)
+    if throttled:
+        _counters["throttled"] += 1
+
+
+async def send(chat_id: int, text: str) -> None:
+    """Отправка одного сообщения; исключения outbox.Retry/Permanent управляют повтором в outbox"""
+    global _paused_until
+    pause = _paused_until - time.monotonic()
+    if pause > 0:
+        raise outbox.Retry(pause, "отправка приостановлена по RetryAfter")
+    await _acquire(chat_id)
+    started = time.perf_counter()
+    try:
+        await bot.send_message(chat_id, text)
+    except TelegramRetryAfter as e:
+        _counters["retry_after"] += 1
+        _paused_until = max(_paused_until, time.monotonic() + e.retry_after)
+        logger.warning(f"Telegram RetryAfter {e.retry_after} с: отправка сообщений приостановлена")
+        raise outbox.Retry(e.retry_after, str(e))
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        _counters["failed"] += 1
+        raise outbox.Permanent(str(e))  # бот заблокирован или чат не существует
+    except Exception:
+        _counters["failed"] += 1
+        raise
+    _counters["sent"] += 1
+    _latency.add((time.perf_counter() - started) * 1000, None)
+
+
+def _track(broadcast_id: str, field: str) -> None:
+    item = _broadcasts.get(broadcast_id)
+    if item is MISSING:
+        return  # рассылку начал другой процесс или запись устарела, ход - в progress()
+    item[field] += 1
+    if item["sent"] + item["failed"] == item["total"]:
+        logger.info(f"Рассылка {broadcast_id}: отправлено {item['sent']} из {item['total']}, "
+                    f"ошибок {item['failed']}, за {time.monotonic() - item['started']:.1f} с")
+        _broadcasts.pop(broadcast_id)
+
+
+async def deliver(payload: dict) -> None:
+    """Обработчик outbox для сообщений Telegram"""
+    broadcast_id = payload.get("broadcast")
+    try:
+        await send(payload["chat_id"], payload["text"])
+    except outbox.Permanent:
+        if broadcast_id:
+            _track(broadcast_id, "failed")
+        raise
+    if broadcast_id:
+        _track(broadcast_id, "sent")
+
+
+outbox.register("telegram", deliver)
+
+
+async def _start(db: Database, sql, params: tuple) -> Tuple[Optional[str], int]:
+    broadcast_id = secrets.token_hex(8)
+    count = await db.execute_rowcount(sql, (*params, broadcast_id, outbox.BULK_PRIORITY))
+    if not count:
+        return None, 0
+    _broadcasts.set(broadcast_id, {"total": count, "sent": 0, "failed": 0, "started": time.monotonic()})
+    logger.info(f"Рассылка {broadcast_id}: {count} получателей")
+    return broadcast_id, count
+
+
+async def notify_class(db: Database, class_number: int, class_letter: str, text: str) -> Tuple[Optional[str], int]:
+    """Рассылка всем ученикам класса с привязанным Telegram, в транзакции db
+
+    :return: (id рассылки, число получателей); (None, 0) - получателей нет или ошибка записи
+    """
+    return await _start(db, Q.outbox_notify_class, (class_number, class_letter, text))
+
+
+async def notify_club(db: Database, club_id: int, text: str) -> Tuple[Optional[str], int]:
+    """Рассылка участникам клуба с привязанным Telegram, в транзакции db"""
+    return await _start(db, Q.outbox_notify_club, (club_id, text))
+
+
+async def progress(broadcast_id: str) -> Dict[str, int]:
+    """Недоставленные сообщения рассылки по статусам (pending, dead); доставленные удалены из outbox"""
+    async with Database(readonly=True) as db:
+        rows = await db.execute_all(Q.outbox_broadcast_progress, (broadcast_id,))
+    return {row["status"]: row["count"] for row in rows or ()}
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "in_progress": len(_broadcasts),
+        "send_avg_ms": round(_latency.total_ms / _latency.calls, 1) if _latency.calls else 0.0,
+        "send_p95_ms": _latency.percentile(0.95),
+    }
+
+
+async def on_cleanup(app) -> None:
+    logger.info(f"Telegram: {stats()}")
@@ -1,9 +1,12 @@
 from database.database import Database
+from database.queries import Q
 import json
 from datetime import date, datetime, timedelta
+from typing import Union
 from aiohttp import web
+from functions import broadcast
 
-async def list(user_id: int, type: str, offset: int, limit: int) -> dict:
+async def list(user_id: int, type: str, offset: int, limit: int) -> Union[bytes, dict]:
     """
     Получение списка клубов по указанному типу выборки
     
@@ -11,56 +14,26 @@ async def list(user_id: int, type: str, offset: int, limit: int) -> dict:
     :param type: Тип выборки (all, my, top)
     :param offset: Смещение для пагинации
     :param limit: Лимит записей
-    :return: Словарь со списком клубов или сообщением об ошибке
+    :return: JSON-массив клубов (байты) или словарь с сообщением об ошибке
     """
     try:
-        async with Database() as db:
+        async with Database(readonly=True) as db:
             # Обработка разных типов запросов
             if type == "all":
-                clubs = await db.execute_all(
-                    """SELECT c.id, c.title, c.max_members_counts, 
-                          c.class_limit_min, c.class_limit_max
-                    FROM clubs c
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM club_members 
-                        WHERE club_id = c.id AND user_id = $1
-                    )
-                    LIMIT $2 OFFSET $3""",
-                    (user_id, limit, offset)
-                )
+                clubs = await db.fetch_json(Q.clubs_all, (user_id, limit, offset))
                 
             elif type == "my":
-                clubs = await db.execute_all(
-                    """SELECT c.id, c.title, c.max_members_counts, 
-                          c.class_limit_min, c.class_limit_max
-                    FROM clubs c
-                    INNER JOIN club_members cm ON c.id = cm.club_id
-                    WHERE cm.user_id = $1
-                    LIMIT $2 OFFSET $3""",
-                    (user_id, limit, offset)
-                )
+                clubs = await db.fetch_json(Q.clubs_my, (user_id, limit, offset))
                 
             elif type == "top":
-                clubs = await db.execute_all(
-                    """SELECT id, title, max_members_counts, 
-                          class_limit_min, class_limit_max, xp
-                    FROM clubs 
-                    ORDER BY xp DESC 
-                    LIMIT $1 OFFSET $2""",
-                    (limit, offset)
-                )
+                clubs = await db.fetch_json(Q.clubs_top, (limit, offset))
                 
             else:
                 return {
                     "status": "error",
                     "message": f"Unknown type: {type}. Valid options: all, my, top"
                 }
-            
-            for club in clubs:
-                members_count = (await db.execute("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1", (club["id"],)))["count"]
-                club["members_count"] = members_count
 
-        
         return clubs
         
     except Exception as e:
@@ -79,9 +52,9 @@ async def get(user_id: int, club_id: int) -> dict:
     :return: Словарь с информацией о клубе или сообщением об ошибке
     """
     try:
-        async with Database() as db:
-            club = await db.execute("SELECT * FROM clubs WHERE id = $1", (club_id,))
-            is_participant = await db.execute("SELECT * FROM club_members WHERE user_id=$1 AND club_id=$2", (user_id, club_id))
+        async with Database(readonly=True) as db:
+            club = await db.execute(Q.club_by_id, (club_id,))
+            is_participant = await db.execute(Q.club_member, (user_id, club_id))
             if is_participant:
                 club["participant"] = True
                 club["admin"] = is_participant["admin"]
@@ -89,9 +62,9 @@ async def get(user_id: int, club_id: int) -> dict:
                 club["participant"] = False
                 club["admin"] = False
                 del club["telegram_url"]
-            res = await db.execute("SELECT title FROM administrations WHERE id = $1", (club["administration"],))
+            res = await db.execute(Q.administration_title, (club["administration"],))
             club["administration"] = res['title'] if res else "Unknown"
-            members_count = (await db.execute("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1", (club_id,)))["count"]
+            members_count = (await db.execute(Q.club_members_count, (club_id,)))["count"]
             club["members_count"] = members_count
         
         return club
@@ -118,17 +91,17 @@ async def create(user_id: int, title: str, description: str, administration: int
     """
     try:
         async with Database() as db:
-            exists = await db.execute("SELECT 1 FROM clubs WHERE title = $1", (title,))
+            exists = await db.execute(Q.club_title_exists, (title,))
             if exists:
                 return web.json_response({"name": "login", "message": "login is already occupied"}, status=409)
             
-            await db.execute("INSERT INTO clubs (title, description, administration, max_members_counts, class_limit_min, class_limit_max, telegram_url) VALUES ($1, $2, $3, $4, $5, $6, $7)",
+            await db.execute(Q.club_insert,
                              (title, description, administration, max_members_counts, class_limit_min, class_limit_max, telegram_url))
-            result = await db.execute("SELECT * FROM clubs WHERE title = $1", (title,))
-            await db.execute("INSERT INTO club_members (club_id, user_id, admin) VALUES ($2, $1, $3)", (user_id, result['id'], True))
+            result = await db.execute(Q.club_by_title, (title,))
+            await db.execute(Q.club_member_insert_admin, (user_id, result['id'], True))
             result["participant"] = True
             result["admin"] = True
-            res = await db.execute("SELECT title FROM administrations WHERE id = $1", (administration,))
+            res = await db.execute(Q.administration_title, (administration,))
             result["administration"] = res['title'] if res else "Unknown"
             return result
     except Exception as e:
@@ -142,8 +115,8 @@ async def check_title(title: str) -> dict:
     :return: Словарь с результатом проверки
     """
     try:
-        async with Database() as db:
-            exists = await db.execute("SELECT 1 FROM clubs WHERE title = $1", (title,))
+        async with Database(readonly=True) as db:
+            exists = await db.execute(Q.club_title_exists, (title,))
             if exists:
                 return web.json_response({"name": "login", "message": "login is already occupied"}, status=409)
         
@@ -163,8 +136,8 @@ async def administrations() -> dict:
     :return: Словарь с результатом проверки
     """
     try:
-        async with Database() as db:
-            result = await db.execute_all("SELECT * FROM administrations")
+        async with Database(readonly=True) as db:
+            result = await db.execute_all(Q.administrations)
         return result
         
     except Exception as e:
@@ -182,20 +155,20 @@ async def join_club(user_id: int, club_id: int) -> dict:
     """
     try:
         async with Database() as db:
-            is_member = await db.execute("SELECT 1 FROM club_members WHERE user_id=$1 AND club_id=$2", (user_id, club_id))
+            is_member = await db.execute(Q.club_member_exists, (user_id, club_id))
             if is_member:
                 return web.json_response({"name": "already join", "message": "already join"}, status=403)
             
-            max_members = (await db.execute("SELECT max_members_counts FROM clubs WHERE id = $1", (club_id,)))["max_members_counts"]
+            max_members = (await db.execute(Q.club_max_members, (club_id,)))["max_members_counts"]
             if max_members > 0:
-                count_participants = (await db.execute("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1", (club_id,)))["count"]
+                count_participants = (await db.execute(Q.club_members_count, (club_id,)))["count"]
                 if count_participants >= max_members:
                     return web.json_response({"name": "max_members_counts", "message": "The group already has the maximum number of members"}, status=403)
         
-            await db.execute("INSERT INTO club_members (club_id, user_id) VALUES ($2, $1)", (user_id, club_id))
-            result = await db.execute("SELECT * FROM clubs WHERE id = $1", (club_id,))
+            await db.execute(Q.club_member_insert, (user_id, club_id))
+            result = await db.execute(Q.club_by_id, (club_id,))
             result["participant"] = True
-            res = await db.execute("SELECT title FROM administrations WHERE id = $1", (result["administration"],))
+            res = await db.execute(Q.administration_title, (result["administration"],))
             result["administration"] = res['title'] if res else "Unknown"
         return result
         
@@ -214,16 +187,16 @@ async def leave_club(user_id: int, club_id: int) -> dict:
     """
     try:
         async with Database() as db:
-            count_admins = (await db.execute("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1 AND admin=true", (club_id,)))["count"]
+            count_admins = (await db.execute(Q.club_admins_count, (club_id,)))["count"]
             if count_admins == 1:
-                is_admin = await db.execute("SELECT 1 FROM club_members WHERE user_id=$1 AND club_id=$2 AND admin=true", (user_id, club_id))
+                is_admin = await db.execute(Q.club_member_is_admin, (user_id, club_id))
                 if is_admin:
                     return web.json_response({"name": "count_admins", "message": "The only administrator cannot leave the club."}, status=403)
             
-            await db.execute("DELETE FROM club_members WHERE user_id=$1 AND club_id=$2", (user_id, club_id))
-            result = await db.execute("SELECT * FROM clubs WHERE id = $1", (club_id,))
+            await db.execute(Q.club_member_delete, (user_id, club_id))
+            result = await db.execute(Q.club_by_id, (club_id,))
             result["participant"] = False
-            res = await db.execute("SELECT title FROM administrations WHERE id = $1", (result["administration"],))
+            res = await db.execute(Q.administration_title, (result["administration"],))
             result["administration"] = res['title'] if res else "Unknown"
         return result
         
@@ -236,10 +209,13 @@ async def leave_club(user_id: int, club_id: int) -> dict:
 async def delete(user_id, club_id):
     try:
         async with Database() as db:
-            res = await db.execute("SELECT 1 FROM club_members WHERE user_id=$1 and admin=true", (user_id,))
+            res = await db.execute(Q.club_member_is_admin, (user_id, club_id))
             if not res:
                 return web.json_response({"name": "user_id", "message": "User is not admin."}, status=401)
-            await db.execute("DELETE FROM clubs WHERE id=$1", (club_id,))
+            club = await db.execute(Q.club_by_id, (club_id,))
+            if club:
+                await broadcast.notify_club(db, club_id, f"Клуб «{club['title']}» удалён")
+            await db.execute(Q.club_delete, (club_id,))
         return web.Response(status=200)
     except Exception as e:
         return {
@@ -250,26 +226,27 @@ async def delete(user_id, club_id):
 async def edit(user_id, club_id, title, description, max_members_counts, class_limit_min, class_limit_max, telegram_url):
     try:
         async with Database() as db:
-            res = await db.execute("SELECT 1 FROM club_members WHERE user_id=$1 and admin=true", (user_id,))
+            res = await db.execute(Q.club_member_is_admin, (user_id, club_id))
             if not res:
                 return web.json_response({"name": "user_id", "message": "User is not admin."}, status=401)
-            if title:
-                await db.execute("UPDATE clubs SET title=$2 WHERE id=$1", (club_id, title))
-            if description:
-                await db.execute("UPDATE clubs SET description=$2 WHERE id=$1", (club_id, description))
-            if max_members_counts:
-                await db.execute("UPDATE clubs SET max_members_counts=$2 WHERE id=$1", (club_id, max_members_counts))
-            if class_limit_min:
-                await db.execute("UPDATE clubs SET class_limit_min=$2 WHERE id=$1", (club_id, class_limit_min))
-            if class_limit_max:
-                await db.execute("UPDATE clubs SET class_limit_max=$2 WHERE id=$1", (club_id, class_limit_max))
-            if telegram_url:
-                await db.execute("UPDATE clubs SET telegram_url=$2 WHERE id=$1", (club_id, telegram_url))
+            club = await db.execute(Q.club_by_id, (club_id,))
+            changed = False
+            for query, column, value in ((Q.club_set_title, "title", title),
+                                         (Q.club_set_description, "description", description),
+                                         (Q.club_set_max_members, "max_members_counts", max_members_counts),
+                                         (Q.club_set_class_limit_min, "class_limit_min", class_limit_min),
+                                         (Q.club_set_class_limit_max, "class_limit_max", class_limit_max),
+                                         (Q.club_set_telegram_url, "telegram_url", telegram_url)):
+                if value and value != club.get(column):
+                    await db.execute(query, (club_id, value))
+                    changed = True
 
-            club = await db.execute("SELECT * FROM clubs WHERE id = $1", (club_id,))
-            res = await db.execute("SELECT title FROM administrations WHERE id = $1", (club["administration"],))
+            if changed:
+                club = await db.execute(Q.club_by_id, (club_id,))
+                await broadcast.notify_club(db, club_id, f"Информация о клубе «{club['title']}» обновлена")
+            res = await db.execute(Q.administration_title, (club["administration"],))
             club["administration"] = res['title'] if res else "Unknown"
-            members_count = (await db.execute("SELECT COUNT(*) as count FROM club_members WHERE club_id=$1", (club_id,)))["count"]
+            members_count = (await db.execute(Q.club_members_count, (club_id,)))["count"]
             club["members_count"] = members_count
             return club
         return web.Response(status=200)
@@ -282,9 +259,9 @@ async def edit(user_id, club_id, title, description, max_members_counts, class_l
 
 async def achievements_global():
     try:
-        async with Database() as db:
-            achievements = await db.execute_all("SELECT title, description, xp FROM achievements WHERE global=true")
-            xp_all = (await db.execute("SELECT SUM(xp) AS total_xp FROM clubs"))["total_xp"]
+        async with Database(readonly=True) as db:
+            achievements = await db.execute_all(Q.achievements_global)
+            xp_all = (await db.execute(Q.clubs_total_xp))["total_xp"]
         for a in achievements:
             a["need_xp"] = a["xp"]
             a["xp"] = xp_all
@@ -297,9 +274,9 @@ async def achievements_global():
     
 async def achievements_local(club_id:int):
     try:
-        async with Database() as db:
-            achievements = await db.execute_all("SELECT title, description, xp FROM achievements WHERE global=false")
-            xp = (await db.execute("SELECT xp FROM clubs WHERE id=$1", (club_id,)))["xp"]
+        async with Database(readonly=True) as db:
+            achievements = await db.execute_all(Q.achievements_local)
+            xp = (await db.execute(Q.club_xp, (club_id,)))["xp"]
         for a in achievements:
             a["need_xp"] = a["xp"]
             a["xp"] = xp
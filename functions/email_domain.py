@@ -0,0 +1,74 @@
+"""Асинхронная проверка, что домен почты принимает письма (есть MX или A запись).
+
+Запросы к DNS выполняются через dns.asyncresolver и не блокируют цикл событий.
+Ответы кешируются по домену: положительные - на время TTL записи (не дольше
+EMAIL_DNS_CACHE_TTL), отрицательные - на EMAIL_DNS_NEGATIVE_TTL. Одновременные
+проверки одного домена ждут один общий запрос. Вся проверка укладывается в
+EMAIL_DNS_TIMEOUT; если DNS не ответил вовремя, домен считается непроверенным
+(результат не кешируется).
+
+Для тестов резолвер можно направить на локальный DNS-сервер через
+EMAIL_DNS_NAMESERVERS и EMAIL_DNS_PORT.
+"""
+import asyncio
+from typing import Dict
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from cache import TTLCache, MISSING
+from config import (logger, EMAIL_DNS_NAMESERVERS, EMAIL_DNS_PORT, EMAIL_DNS_TIMEOUT,
+                    EMAIL_DNS_CACHE_TTL, EMAIL_DNS_NEGATIVE_TTL)
+
+_resolver = dns.asyncresolver.Resolver(configure=not EMAIL_DNS_NAMESERVERS)
+if EMAIL_DNS_NAMESERVERS:
+    _resolver.nameservers = EMAIL_DNS_NAMESERVERS
+    _resolver.port = EMAIL_DNS_PORT
+_resolver.lifetime = EMAIL_DNS_TIMEOUT
+
+_cache = TTLCache(10000, EMAIL_DNS_CACHE_TTL)  # домен -> True/False
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+async def _resolve(domain: str) -> bool:
+    """MX, а при его отсутствии A запись (RFC 5321, неявный MX)"""
+    for record in ('MX', 'A'):
+        try:
+            answer = await _resolver.resolve(domain, record)
+        except dns.resolver.NXDOMAIN:
+            break
+        except (dns.resolver.NoAnswer, dns.resolver.NoNameservers):
+            continue
+        _cache.set(domain, True, ttl=min(answer.rrset.ttl, EMAIL_DNS_CACHE_TTL))
+        return True
+    _cache.set(domain, False, ttl=EMAIL_DNS_NEGATIVE_TTL)
+    return False
+
+
+async def _check(domain: str) -> bool:
+    try:
+        return await asyncio.wait_for(_resolve(domain), EMAIL_DNS_TIMEOUT)
+    except (asyncio.TimeoutError, dns.exception.Timeout):
+        logger.warning(f"DNS не ответил за {EMAIL_DNS_TIMEOUT} с при проверке домена {domain}")
+        return False
+    except dns.exception.DNSException as e:
+        logger.warning(f"Ошибка DNS при проверке домена {domain}: {e}")
+        return False
+    finally:
+        _in_flight.pop(domain, None)
+
+
+async def accepts_mail(domain: str) -> bool:
+    """Есть ли у домена почтовый сервер"""
+    domain = domain.lower().rstrip('.')
+    cached = _cache.get(domain)
+    if cached is not MISSING:
+        return cached
+    task = _in_flight.get(domain)
+    if task is None:
+        task = _in_flight[domain] = asyncio.ensure_future(_check(domain))
+    # shield: отмена одного ожидающего запроса не отменяет общую проверку
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    return _cache.stats()
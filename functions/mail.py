@@ -1,75 +1,187 @@
+"""Отправка писем.
+
+Обработчики не отправляют письма сами: send_email_edit и send_password_edit записывают
+их в outbox в транзакции запроса (см. database/outbox.py), а диспетчер outbox вызывает
+deliver(). Письма отправляют MAIL_WORKERS фоновых задач, у каждой - своё постоянное
+авторизованное SMTP-соединение: письма, накопившиеся в очереди, уходят пачкой по одному
+соединению. Повторные попытки выполняет outbox.
+"""
 import asyncio
+import time
+from typing import List, NamedTuple, Optional
 import aiosmtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from config import logger, EMAIL_PASSWORD, EMAIL_USERNAME, EMAIL_PORT, EMAIL_HOSTNAME
+from jinja2 import TemplateNotFound
+from config import (logger, EMAIL_PASSWORD, EMAIL_USERNAME, EMAIL_PORT, EMAIL_HOSTNAME, EMAIL_USE_TLS,
+                    EMAIL_VALIDATE_CERTS, MAIL_WORKERS, MAIL_QUEUE_SIZE, MAIL_BATCH_SIZE, MAIL_IDLE_TIMEOUT)
+from database import outbox
+from database.database import Database
+from database.metrics import StatementStats
+from functions import templates
 
 # async def send_email_register(to_email: str, code: str) -> bool:
-#     await send_mail(to_email, 
-#                     'data/mail.html', 
+#     await send_mail(to_email,
+#                     'data/mail.html',
 #                     f"https://school-hub.ru/verify-email?token={code}",
 #                     'Подтверждение регистрации | school-hub.ru')
-    
-async def send_email_edit(to_email: str, code: str) -> bool:
-    await send_mail(to_email, 
-                    'data/mail.html', 
-                    f"https://api.school-hub.ru/verify-email?token={code}",
-                    'Изменение почты | Школа+')
-
-async def send_password_edit(to_email: str, url: str):
-    await send_mail(to_email, 
-                    'data/edit_password.html', 
-                    url,
-                    'Изменение пароля | Школа+')
-
-async def send_mail(to_email: str, mail_path:str, url:str, title:str):
-    smtp_config = {
-        'hostname': EMAIL_HOSTNAME,
-        'port': EMAIL_PORT,
-        'username': EMAIL_USERNAME,
-        'password': EMAIL_PASSWORD,
-        'use_tls': True
+
+async def send_email_edit(db: Database, to_email: str, code: str) -> Optional[int]:
+    return await send_mail(db, to_email,
+                           'mail.html',
+                           f"https://api.school-hub.ru/verify-email?token={code}",
+                           'Изменение почты | Школа+')
+
+async def send_password_edit(db: Database, to_email: str, url: str) -> Optional[int]:
+    return await send_mail(db, to_email,
+                           'edit_password.html',
+                           url,
+                           'Изменение пароля | Школа+')
+
+
+async def send_mail(db: Database, to_email: str, template_name: str, url: str, title: str) -> Optional[int]:
+    """Запись письма в outbox в транзакции db; None - запись не удалась"""
+    return await outbox.add(db, "mail", {"to": to_email, "template": template_name, "url": url, "title": title})
+
+
+class Mail(NamedTuple):
+    to_email: str
+    message: str
+    queued_at: float
+    done: asyncio.Future  # результат отправки для deliver()
+
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_latency = StatementStats()  # от постановки в очередь до доставки, мс
+_counters = {"queued": 0, "sent": 0, "failed": 0}
+
+
+async def deliver(payload: dict) -> None:
+    """Отправка письма из outbox; исключение - попытка не удалась"""
+    try:
+        template = templates.get(payload["template"], payload["title"])
+    except TemplateNotFound:
+        raise outbox.Permanent(f"шаблон письма {payload['template']} не найден")
+    if _queue is None:
+        raise RuntimeError("очередь писем не запущена")
+    message = template.render(payload["to"], confirmation_url=payload["url"])
+    mail = Mail(payload["to"], message, time.monotonic(), asyncio.get_running_loop().create_future())
+    try:
+        _queue.put_nowait(mail)
+    except asyncio.QueueFull:
+        raise RuntimeError(f"очередь писем переполнена ({MAIL_QUEUE_SIZE})")
+    _counters["queued"] += 1
+    await mail.done
+
+
+outbox.register("mail", deliver)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Ошибки 5xx (адрес не существует, письмо отклонено) повторять бессмысленно"""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(500 <= item.code < 600 for item in error.recipients)
+    return isinstance(error, aiosmtplib.SMTPResponseException) and 500 <= error.code < 600
+
+
+class _Connection:
+    """Постоянное SMTP-соединение одного обработчика очереди"""
+
+    def __init__(self):
+        self.smtp: Optional[aiosmtplib.SMTP] = None
+
+    async def get(self) -> aiosmtplib.SMTP:
+        if self.smtp is None or not self.smtp.is_connected:
+            self.smtp = aiosmtplib.SMTP(hostname=EMAIL_HOSTNAME, port=EMAIL_PORT,
+                                        use_tls=EMAIL_USE_TLS, validate_certs=EMAIL_VALIDATE_CERTS)
+            await self.smtp.connect()
+            if EMAIL_USERNAME:
+                await self.smtp.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+        return self.smtp
+
+    async def close(self) -> None:
+        if self.smtp is not None and self.smtp.is_connected:
+            try:
+                await self.smtp.quit()
+            except aiosmtplib.SMTPException:
+                self.smtp.close()
+        self.smtp = None
+
+
+async def _send(connection: _Connection, mail: Mail) -> None:
+    if mail.done.done():
+        return  # outbox уже не ждёт письмо (таймаут) и повторит его сам
+    try:
+        smtp = await connection.get()
+        await smtp.sendmail(EMAIL_USERNAME, mail.to_email, mail.message)
+    except (aiosmtplib.SMTPException, OSError) as e:
+        await connection.close()  # состояние сессии неизвестно, следующее письмо откроет новую
+        _counters["failed"] += 1
+        if not mail.done.done():
+            mail.done.set_exception(outbox.Permanent(str(e)) if _is_permanent(e) else e)
+        return
+    _counters["sent"] += 1
+    _latency.add((time.monotonic() - mail.queued_at) * 1000, None)
+    if not mail.done.done():
+        mail.done.set_result(None)
+
+
+async def _worker() -> None:
+    connection = _Connection()
+    try:
+        while True:
+            try:
+                mail = await asyncio.wait_for(_queue.get(), MAIL_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await connection.close()  # простаивающее соединение сервер всё равно закроет
+                continue
+            # Пачка: всё, что уже накопилось в очереди, отправляется по тому же соединению
+            batch = [mail]
+            while len(batch) < MAIL_BATCH_SIZE and not _queue.empty():
+                batch.append(_queue.get_nowait())
+            for mail in batch:
+                try:
+                    await _send(connection, mail)
+                except Exception as e:
+                    logger.error(f"Критическая ошибка отправки письма: {e}")
+                    if not mail.done.done():
+                        mail.done.set_exception(e)
+                finally:
+                    _queue.task_done()
+    finally:
+        await connection.close()
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "depth": _queue.qsize() if _queue is not None else 0,
+        "latency_avg_ms": round(_latency.total_ms / _latency.calls, 1) if _latency.calls else 0.0,
+        "latency_p95_ms": _latency.percentile(0.95),
+        "latency_max_ms": round(_latency.max_ms, 1),
     }
 
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: очередь и обработчики писем"""
+    global _queue
+    _queue = asyncio.Queue(maxsize=MAIL_QUEUE_SIZE)
+    loop = asyncio.get_running_loop()
+    _workers.extend(loop.create_task(_worker()) for _ in range(MAIL_WORKERS))
+
+
+async def on_cleanup(app) -> None:
+    """aiohttp on_cleanup: дожидаемся отправки очереди (не дольше 5 с) и останавливаем обработчики.
+    Неотправленные письма остаются в outbox"""
+    global _queue
+    if _queue is None:
+        return
     try:
-        with open(mail_path, 'r', encoding='utf-8') as file:
-            html_template = file.read()
-    except FileNotFoundError:
-        logger.error("Ошибка: Шаблон письма не найден")
-        return False
-
-    html_content = html_template.replace(
-        '{{confirmation_url}}',
-        url
-    )
-
-    msg = MIMEMultipart('alternative')
-    msg['From'] = smtp_config['username']
-    msg['To'] = to_email
-    msg['Subject'] = title
-    msg.attach(MIMEText(html_content, 'html'))
-
-    for attempt in range(3):
-        try:
-            async with aiosmtplib.SMTP(
-                hostname=smtp_config['hostname'],
-                port=smtp_config['port'],
-                use_tls=smtp_config['use_tls'],
-                validate_certs=False
-            ) as server:
-                await server.login(smtp_config['username'], smtp_config['password'])
-                await server.sendmail(
-                    smtp_config['username'],
-                    to_email,
-                    msg.as_string()
-                )
-            return True
-        except aiosmtplib.SMTPException as e:
-            logger.warning(f"Попытка {attempt+1}: Ошибка отправки - {str(e)}")
-            if attempt < 2:
-                await asyncio.sleep(2**attempt)  # Экспоненциальная задержка 
-        except Exception as e:
-            logger.error(f"Критическая ошибка: {str(e)}")
-            break
-
-    return False
\ No newline at end of file
+        await asyncio.wait_for(_queue.join(), 5)
+    except asyncio.TimeoutError:
+        logger.warning(f"Не отправлено писем при остановке: {_queue.qsize()}")
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    logger.info(f"Почта: {stats()}")
+    _queue = None
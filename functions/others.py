@@ -1,11 +1,12 @@
 from database.database import Database
+from database.queries import Q
 import json
 from datetime import date, datetime, timedelta
 from aiohttp import web
 
 async def teachers():
-    async with Database() as db:
-        result = await db.execute_all("SELECT name, subject FROM teachers")
+    async with Database(readonly=True) as db:
+        result = await db.execute_all(Q.teachers)
         for res in result:
-            res["subject"] = (await db.execute("SELECT title FROM subjects WHERE id=$1", (res["subject"],)))["subject"]
+            res["subject"] = (await db.execute(Q.subject_title, (res["subject"],)))["subject"]
     return result
\ No newline at end of file
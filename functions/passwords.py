@@ -0,0 +1,140 @@
+"""Хеширование паролей (scrypt) в ограниченном пуле потоков.
+
+hashlib.scrypt отпускает GIL на время вычисления, поэтому потоки считают хеши параллельно,
+а цикл событий продолжает обслуживать остальные запросы. Очередь ограничена
+PASSWORD_HASH_QUEUE задачами: при её переполнении сразу выбрасывается HashQueueFull (503),
+чтобы волна входов не копила ожидающие запросы.
+
+Формат хеша: scrypt$<n>$<r>$<p>$<соль base64>$<хеш base64>. Пароли, сохранённые
+до перехода на хеши, хранятся открытым текстом и перехешируются при успешном входе.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from config import logger, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_SCRYPT_N
+from database.metrics import StatementStats
+
+PREFIX = "scrypt$"
+SCRYPT_R = 8
+SCRYPT_P = 1
+KEY_LENGTH = 32
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_pending = 0  # задач в работе и в очереди
+_stats = {"hash": StatementStats(), "verify": StatementStats(), "wait": StatementStats()}
+_rejected = 0
+
+
+class HashQueueFull(Exception):
+    """Очередь хеширования переполнена - запрос нужно повторить позже"""
+
+    def __init__(self, retry_after: float = 1):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__("Password hashing queue is full")
+
+    def response(self) -> web.Response:
+        return web.Response(status=503, text="Too many login attempts, try again later",
+                            headers={"Retry-After": str(self.retry_after)})
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=KEY_LENGTH)
+
+
+def _hash_sync(password: str) -> str:
+    salt = os.urandom(16)
+    key = _scrypt(password, salt, PASSWORD_SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return (f"{PREFIX}{PASSWORD_SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$"
+            f"{base64.b64encode(salt).decode()}${base64.b64encode(key).decode()}")
+
+
+def _verify_sync(password: str, stored: str) -> bool:
+    try:
+        _, n, r, p, salt, key = stored.split("$")
+        expected = base64.b64decode(key)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        logger.error("Повреждённый хеш пароля")
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+async def _run(kind: str, func, *args):
+    global _pending, _rejected
+    if _pending >= PASSWORD_HASH_QUEUE:
+        _rejected += 1
+        raise HashQueueFull()
+    _pending += 1
+    queued = time.perf_counter()
+
+    def timed():
+        started = time.perf_counter()
+        return func(*args), started, time.perf_counter()
+
+    try:
+        result, started, finished = await asyncio.get_running_loop().run_in_executor(_executor, timed)
+    finally:
+        _pending -= 1
+    # статистика пишется в цикле событий, а не в потоках пула
+    _stats["wait"].add((started - queued) * 1000, None)
+    _stats[kind].add((finished - started) * 1000, None)
+    return result
+
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(PREFIX)
+
+
+def needs_rehash(stored: str) -> bool:
+    """Пароль открытым текстом или хеш с устаревшими параметрами"""
+    return not stored.startswith(f"{PREFIX}{PASSWORD_SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+async def hash_password(password: str) -> str:
+    return await _run("hash", _hash_sync, password)
+
+
+async def verify_password(password: str, stored: str) -> bool:
+    """Проверка пароля; старые пароли открытым текстом сравниваются без пула"""
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    return await _run("verify", _verify_sync, password, stored)
+
+
+_dummy_hash = None
+
+async def dummy_verify(password: str) -> bool:
+    """Проверка с фиктивным хешем, когда пользователь не найден: ответ занимает
+    столько же времени, и по нему нельзя узнать, существует ли логин"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password(os.urandom(16).hex())
+    await verify_password(password, _dummy_hash)
+    return False
+
+
+def stats() -> dict:
+    """Задержки хеширования, мс: hash/verify - вычисление, wait - ожидание в очереди"""
+    result = {"pending": _pending, "rejected": _rejected}
+    for kind, item in _stats.items():
+        result[kind] = {"calls": item.calls, "avg_ms": round(item.total_ms / item.calls, 1) if item.calls else 0.0,
+                        "p95_ms": item.percentile(0.95), "max_ms": round(item.max_ms, 1)}
+    return result
+
+
+async def on_cleanup(app) -> None:
+    """aiohttp on_cleanup: статистика хеширования и остановка пула потоков"""
+    for kind, item in stats().items():
+        if isinstance(item, dict) and item["calls"]:
+            logger.info(f"Пароли, {kind}: вызовов {item['calls']}, в среднем {item['avg_ms']} мс, "
+                        f"p95 {item['p95_ms']} мс, max {item['max_ms']} мс")
+    if _rejected:
+        logger.warning(f"Пароли: отклонено запросов при переполнении очереди: {_rejected}")
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,50 +1,69 @@
-from database.database import Database
+from database.database import Database, release_request_connection
+from database.queries import Q
+from database.functions import invalidate_user
 from aiohttp import web
 from functions import mail
+from functions import telegram
+from functions import tokens
+from functions import passwords
 from core import generate_unique_code
-from config import bot
 
 async def info(user_id:int):
-    async with Database() as db:
-        res = await db.execute("SELECT login, email, name, surname, class_number, class_letter, telegram_id FROM users WHERE id=$1", (user_id,))
-    if res["telegram_id"]:
-        try:
-            res["telegram_name"] = (await bot.get_chat(res["telegram_id"])).username
-        except:
-            res["telegram_name"] = ""
-    else:
-        res["telegram_name"] = ""
+    async with Database(readonly=True) as db:
+        res = await db.execute(Q.user_profile, (user_id,))
+    res["telegram_name"] = await telegram.username(res["telegram_id"]) if res["telegram_id"] else ""
     del res["telegram_id"]
     return res
 
 async def set_login(user_id:int, loign_new:str):
     async with Database() as db:
-        res = await db.execute("SELECT 1 FROM users WHERE login = $1", (loign_new,))
+        res = await db.execute(Q.user_login_exists, (loign_new, user_id))
         if res:
             return web.json_response({"name": "login", "error": "The login has already been registered"}, status=409)
-        await db.execute("UPDATE users SET login=$2 WHERE id=$1", (user_id, loign_new))
+        await db.execute(Q.user_set_login, (user_id, loign_new))
+    invalidate_user(user_id)
+    await tokens.revoke_user(user_id)  # логин записан в access-токенах
     return web.Response(status=204)
 
 async def set_email(user_id:int, email_new:str):
     async with Database() as db:
-        res = await db.execute("SELECT 1 FROM users WHERE email = $1", (email_new,))
+        res = await db.execute(Q.user_email_exists, (email_new,))
         if res:
             return web.json_response({"name": "email", "error": "The email has already been registered"}, status=409)
-        await db.execute("DELETE FROM new_email WHERE user_id = $1", (user_id,))
+        await db.execute(Q.new_email_delete_user, (user_id,))
         token = generate_unique_code()
-        await mail.send_email_edit(email_new, token)
-        await db.execute("INSERT INTO new_email (token, user_id, new_email) VALUES ($1, $2, $3)", (token, user_id, email_new))
+        await db.execute(Q.new_email_insert, (token, user_id, email_new))
+        await mail.send_email_edit(db, email_new, token)
+        if db.last_error is not None:  # транзакция откатится вместе с письмом
+            return web.Response(status=500, text="Server-side error")
     return web.Response(status=204)
 
 async def set_password(user_id:int, password_old:str, password_new:str):
-    async with Database() as db:
-        res = await db.execute("SELECT password FROM users WHERE id=$1", (user_id,))
-        if not res or res["password"] != password_old:
+    async with Database(readonly=True) as db:
+        res = await db.execute(Q.user_password, (user_id,))
+    await release_request_connection()  # не держим соединение пула, пока считается хеш
+    try:
+        if not res or not await passwords.verify_password(password_old, res["password"]):
             return web.json_response({"name": "password_old", "error": "The old password is incorrect"}, status=400)
-        await db.execute("UPDATE users SET password=$2 WHERE id=$1", (user_id, password_new))
+        password_hash = await passwords.hash_password(password_new)
+    except passwords.HashQueueFull as e:
+        return e.response()
+    async with Database() as db:
+        await db.execute(Q.user_set_password, (user_id, password_hash))
+        await db.execute(Q.tokens_delete_user, (user_id,))  # refresh-токены всех сессий
+    invalidate_user(user_id)
+    await tokens.revoke_user(user_id)
     return web.Response(status=204)
 
+async def connect_token(user_id:int) -> str:
+    """Новый непрозрачный токен для ссылки привязки Telegram"""
+    token = generate_unique_code()
+    async with Database() as db:
+        await db.execute(Q.token_insert, (user_id, token))
+    return token
+
 async def telegram_out(user_id:int):
     async with Database() as db:
-        await db.execute("UPDATE users SET telegram_id=NULL WHERE id=$1", (user_id,))
+        await db.execute(Q.user_telegram_out, (user_id,))
+    invalidate_user(user_id)
     return web.Response(status=204)
\ No newline at end of file
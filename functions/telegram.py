@@ -0,0 +1,131 @@
+"""Telegram: сообщения пользователям через outbox и кеш имён пользователей.
+
+send_message записывает сообщение в транзакции запроса, отправляет его диспетчер outbox
+с учётом лимитов Telegram (см. functions/broadcast.py).
+
+username() отдаёт имя пользователя в Telegram из кеша, не дожидаясь Telegram: имя старше
+TELEGRAM_NAME_TTL отдаётся как есть и обновляется в фоне (не дольше TELEGRAM_NAME_MAX_AGE).
+Имени нет в кеше - отдаётся пустая строка, а имя загружается в фоне (с TELEGRAM_NAME_WAIT > 0
+ответ ждёт его столько секунд). Одновременные обновления одного пользователя выполняются
+одним запросом get_chat.
+При запуске сервера в фоне загружаются имена активных пользователей (с действующей сессией).
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from cache import TTLCache, MISSING
+from config import (logger, bot, TELEGRAM_NAME_TTL, TELEGRAM_NAME_MAX_AGE, TELEGRAM_NAME_WAIT,
+                    TELEGRAM_NAME_WARMUP)
+from database import outbox
+from database.database import Database
+from database.queries import Q
+
+NAME_RETRY = 60  # повтор неудачного обновления имени, секунды
+WARMUP_CHUNK = 100  # имён, загружаемых при запуске одной пачкой (параллельно не больше _fetch_limit)
+
+_names = TTLCache(20000, TELEGRAM_NAME_MAX_AGE)  # telegram_id -> (имя, время получения time.monotonic())
+_refreshing: Dict[int, asyncio.Task] = {}
+_fetch_limit = asyncio.Semaphore(4)  # одновременных запросов get_chat
+_retry_until = 0.0  # Telegram попросил подождать (RetryAfter) - до этого времени не обращаемся
+_warmup: Optional[asyncio.Task] = None
+
+
+async def send_message(db: Database, chat_id: int, text: str) -> Optional[int]:
+    """Запись сообщения в outbox в транзакции db; None - запись не удалась"""
+    return await outbox.add(db, "telegram", {"chat_id": chat_id, "text": text})
+
+
+async def _fetch(telegram_id: int) -> str:
+    global _retry_until
+    try:
+        async with _fetch_limit:
+            pause = _retry_until - time.monotonic()
+            if pause > 0:  # RetryAfter пришёл, пока запрос ждал очереди
+                await asyncio.sleep(pause)
+            chat = await bot.get_chat(telegram_id)
+        username, fetched = chat.username or "", time.monotonic()
+    except (TelegramForbiddenError, TelegramBadRequest):
+        username, fetched = "", time.monotonic()  # чат недоступен боту
+    except Exception as e:
+        if isinstance(e, TelegramRetryAfter):
+            _retry_until = time.monotonic() + e.retry_after
+        logger.warning(f"Не удалось получить имя пользователя Telegram {telegram_id}: {e}")
+        cached = _names.get(telegram_id)
+        username = cached[0] if cached is not MISSING else ""
+        fetched = time.monotonic() - TELEGRAM_NAME_TTL + NAME_RETRY  # старое имя, повтор через NAME_RETRY
+    finally:
+        _refreshing.pop(telegram_id, None)
+    _names.set(telegram_id, (username, fetched))
+    return username
+
+
+def _refresh(telegram_id: int) -> Optional[asyncio.Task]:
+    """Фоновое обновление имени; одно на пользователя"""
+    task = _refreshing.get(telegram_id)
+    if task is None and time.monotonic() >= _retry_until:
+        task = _refreshing[telegram_id] = asyncio.get_running_loop().create_task(_fetch(telegram_id))
+    return task
+
+
+async def username(telegram_id: int) -> str:
+    """Имя пользователя в Telegram; пустая строка - имени нет или оно ещё не получено"""
+    cached = _names.get(telegram_id)
+    if cached is not MISSING:
+        name, fetched = cached
+        if time.monotonic() - fetched > TELEGRAM_NAME_TTL:
+            _refresh(telegram_id)
+        return name
+    task = _refresh(telegram_id)
+    if task is None or TELEGRAM_NAME_WAIT <= 0:
+        return ""
+    try:
+        # shield: по таймауту перестаём ждать, но имя всё равно попадёт в кеш
+        return await asyncio.wait_for(asyncio.shield(task), TELEGRAM_NAME_WAIT)
+    except asyncio.TimeoutError:
+        return ""
+
+
+async def warm_up(limit: int = TELEGRAM_NAME_WARMUP) -> int:
+    """Загрузка имён активных пользователей в кеш
+
+    :return: Число загруженных имён
+    """
+    async with Database(readonly=True) as db:
+        rows = await db.execute_all(Q.users_telegram_active, (limit,))
+    telegram_ids = [row["telegram_id"] for row in rows or ()]
+    loaded = 0
+    for start in range(0, len(telegram_ids), WARMUP_CHUNK):
+        if time.monotonic() < _retry_until:
+            await asyncio.sleep(_retry_until - time.monotonic())
+        tasks = [task for task in map(_refresh, telegram_ids[start:start + WARMUP_CHUNK]) if task is not None]
+        await asyncio.gather(*tasks)
+        loaded += len(tasks)
+    return loaded
+
+
+async def _run_warm_up() -> None:
+    started = time.monotonic()
+    try:
+        loaded = await warm_up()
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить имена пользователей Telegram: {e}")
+        return
+    logger.info(f"Имена пользователей Telegram: загружено {loaded} за {time.monotonic() - started:.1f} с")
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: фоновая загрузка имён активных пользователей"""
+    global _warmup
+    if TELEGRAM_NAME_WARMUP > 0:
+        _warmup = asyncio.get_running_loop().create_task(_run_warm_up())
+
+
+async def on_cleanup(app) -> None:
+    global _warmup
+    tasks = list(_refreshing.values()) + ([_warmup] if _warmup is not None else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _warmup = None
+    logger.info(f"Кеш имён Telegram: {_names.stats()}")
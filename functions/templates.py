@@ -0,0 +1,98 @@
+"""Шаблоны писем из data/ (Jinja2).
+
+Все шаблоны компилируются один раз при запуске сервера. Для каждой пары
+(шаблон, тема) один раз собирается MIME-каркас письма - заголовки и граница частей,
+поэтому при отправке рендерится только HTML и подставляется адрес получателя.
+При TEMPLATES_AUTO_RELOAD изменённые файлы перечитываются без перезапуска (для разработки).
+"""
+import base64
+import os
+import secrets
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Dict, Tuple
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from config import logger, EMAIL_USERNAME, TEMPLATES_AUTO_RELOAD
+from database.metrics import StatementStats
+
+TEMPLATES_DIR = "data"
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+)
+
+_TO = "\x00to\x00"
+_BODY = "\x00body\x00"
+
+
+class MailTemplate:
+    """Готовый MIME-каркас письма; render() подставляет получателя и HTML"""
+
+    def __init__(self, name: str, subject: str):
+        self.name = name
+        self.stats = StatementStats()  # время рендера, мс
+        # Символ _ не встречается в base64, поэтому граница не совпадёт с телом письма
+        msg = MIMEMultipart('alternative', boundary=f"=_school_hub_{secrets.token_hex(8)}")
+        msg['From'] = EMAIL_USERNAME or ''
+        msg['To'] = _TO
+        msg['Subject'] = subject
+        part = MIMEText('', 'html', 'utf-8')
+        part.set_payload(_BODY)
+        msg.attach(part)
+        self._head, rest = msg.as_string().split(_TO)
+        self._middle, self._tail = rest.split(_BODY)
+
+    def render(self, to_email: str, **context) -> str:
+        """Письмо целиком (для smtp.sendmail)"""
+        started = time.perf_counter()
+        html = env.get_template(self.name).render(**context)
+        body = base64.encodebytes(html.encode('utf-8')).decode('ascii')
+        message = f"{self._head}{to_email}{self._middle}{body}{self._tail}"
+        self.stats.add((time.perf_counter() - started) * 1000, None)
+        return message
+
+
+_mail_templates: Dict[Tuple[str, str], MailTemplate] = {}
+
+
+def get(name: str, subject: str) -> MailTemplate:
+    """Каркас письма; шаблона нет - jinja2.TemplateNotFound"""
+    template = _mail_templates.get((name, subject))
+    if template is None:
+        env.get_template(name)
+        template = _mail_templates[(name, subject)] = MailTemplate(name, subject)
+    return template
+
+
+def load_all() -> int:
+    """Компиляция всех шаблонов из data/"""
+    names = [name for name in os.listdir(TEMPLATES_DIR) if name.endswith(".html")]
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def stats() -> Dict[str, dict]:
+    result = {}
+    for (name, subject), template in _mail_templates.items():
+        item = template.stats
+        if item.calls:
+            result[f"{name} ({subject})"] = {"calls": item.calls, "avg_ms": round(item.total_ms / item.calls, 3),
+                                            "max_ms": round(item.max_ms, 3)}
+    return result
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: компиляция шаблонов писем"""
+    started = time.perf_counter()
+    count = load_all()
+    logger.info(f"Шаблоны писем: загружено {count} за {(time.perf_counter() - started) * 1000:.1f} мс")
+
+
+async def on_cleanup(app) -> None:
+    for name, item in stats().items():
+        logger.info(f"Шаблон письма {name}: отрисовок {item['calls']}, "
+                    f"в среднем {item['avg_ms']} мс, max {item['max_ms']} мс")
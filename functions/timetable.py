@@ -0,0 +1,232 @@
+"""Расписание уроков в памяти процесса.
+
+Уроки и звонки всех классов загружаются целиком при запуске сервера в словари
+с ключами (класс, день недели) -> номер урока. Замены и особое время звонков
+загружаются по дате при первом запросе этой даты (сразу для всех классов) и хранятся
+для TIMETABLE_CACHE_DATES последних дат. Расписание класса на день - это поиск
+в словарях и наложение замен на не больше чем десяток уроков, без запросов к БД.
+
+Изменения таблиц расписания приходят через NOTIFY timetable (имя таблицы в payload):
+уроки и звонки перезагружаются в фоне, а до конца загрузки отдаётся прежнее расписание;
+замены и особое время сбрасываются и загрузятся заново при следующем запросе.
+На случай потерянных уведомлений всё перезагружается раз в TIMETABLE_RELOAD_INTERVAL.
+"""
+import asyncio
+import contextvars
+import time
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from cache import TTLCache, MISSING
+from config import logger, TIMETABLE_RELOAD_INTERVAL, TIMETABLE_CACHE_DATES
+from database import listener
+from database.database import Database
+from database.queries import Q
+
+
+class Bell(NamedTuple):
+    start_time: str
+    stop_time: str
+
+
+class Lesson(NamedTuple):
+    title: str
+    classrooms: Optional[list]
+    teachers: Optional[list]
+
+
+ClassKey = Tuple[int, str]  # (номер класса, буква)
+
+
+class Week(NamedTuple):
+    bells: Dict[int, Dict[int, Bell]]  # день недели (1 - понедельник) -> номер урока -> звонок
+    lessons: Dict[Tuple[int, str, int], Dict[int, Lesson]]  # (класс, буква, день недели) -> номер урока -> урок
+
+
+class Day(NamedTuple):
+    bells: Dict[int, Bell]  # особое время звонков на дату
+    substitutions: Dict[ClassKey, Dict[int, Lesson]]  # замены на дату
+
+
+_EMPTY: dict = {}
+
+_week: Optional[Week] = None
+_week_task: Optional[asyncio.Task] = None
+_week_dirty = False  # пришло изменение, пока шла загрузка
+_days = TTLCache(TIMETABLE_CACHE_DATES, TIMETABLE_RELOAD_INTERVAL)  # date -> Day
+_day_tasks: Dict[date, asyncio.Task] = {}
+_generation = 0  # растёт при изменении замен или особого времени
+_task: Optional[asyncio.Task] = None
+_counters = {"week_loads": 0, "day_loads": 0}
+
+
+def _background(coro) -> asyncio.Task:
+    # Пустой контекст: загрузка не должна занимать соединение HTTP-запроса, который её начал.
+    # create_task копирует текущий контекст (параметр context= есть только с Python 3.11)
+    return contextvars.Context().run(asyncio.get_running_loop().create_task, coro)
+
+
+async def _load_week() -> Week:
+    async with Database(readonly=True) as db:
+        bell_rows = await db.execute_all(Q.timetable_bells)
+        lesson_rows = await db.execute_all(Q.timetable_lessons)
+    if bell_rows is None or lesson_rows is None:
+        raise RuntimeError("не удалось загрузить расписание из БД")
+    bells: Dict[int, Dict[int, Bell]] = {}
+    for row in bell_rows:
+        bells.setdefault(row["day_number"], {}).setdefault(
+            row["lesson_number"], Bell(row["start_time"], row["stop_time"]))
+    lessons: Dict[Tuple[int, str, int], Dict[int, Lesson]] = {}
+    for row in lesson_rows:
+        key = (row["class_number"], row["class_letter"], row["day_number"])
+        lessons.setdefault(key, {}).setdefault(
+            row["lesson_number"], Lesson(row["title"], row["classrooms"], row["teachers"]))
+    return Week(bells, lessons)
+
+
+async def _reload_week() -> None:
+    """Загрузка уроков и звонков; при ошибке остаётся прежнее расписание"""
+    global _week, _week_dirty, _week_task
+    try:
+        while True:
+            _week_dirty = False
+            started = time.perf_counter()
+            _week = await _load_week()
+            _counters["week_loads"] += 1
+            logger.info(f"Расписание загружено: {len(_week.lessons)} дней классов "
+                        f"за {(time.perf_counter() - started) * 1000:.0f} мс")
+            if not _week_dirty:
+                break
+    except Exception as e:
+        logger.error(f"Не удалось загрузить расписание: {e}")
+    finally:
+        _week_task = None
+
+
+def _start_week_reload() -> asyncio.Task:
+    global _week_task
+    if _week_task is None:
+        _week_task = _background(_reload_week())
+    return _week_task
+
+
+async def _get_week() -> Week:
+    if _week is None:
+        await asyncio.shield(_start_week_reload())
+        if _week is None:
+            raise RuntimeError("расписание не загружено")
+    return _week
+
+
+async def _load_day(day: date) -> Day:
+    generation = _generation
+    try:
+        async with Database(readonly=True) as db:
+            bell_rows = await db.execute_all(Q.timetable_bells_special, (day,))
+            substitution_rows = await db.execute_all(Q.timetable_substitutions, (day,))
+        if bell_rows is None or substitution_rows is None:
+            raise RuntimeError(f"не удалось загрузить замены на {day}")
+        bells: Dict[int, Bell] = {}
+        for row in bell_rows:
+            bells.setdefault(row["lesson_number"], Bell(row["start_time"], row["stop_time"]))
+        substitutions: Dict[ClassKey, Dict[int, Lesson]] = {}
+        for row in substitution_rows:
+            substitutions.setdefault((row["class_number"], row["class_letter"]), {}).setdefault(
+                row["lesson_number"], Lesson(row["title"], row["classrooms"], row["teachers"]))
+        result = Day(bells, substitutions)
+        _counters["day_loads"] += 1
+        if generation == _generation:  # за время загрузки замены не менялись
+            _days.set(day, result)
+        return result
+    finally:
+        if _day_tasks.get(day) is asyncio.current_task():
+            del _day_tasks[day]
+
+
+async def _get_day(day: date) -> Day:
+    cached = _days.get(day)
+    if cached is not MISSING:
+        return cached
+    task = _day_tasks.get(day)
+    if task is None:
+        task = _day_tasks[day] = _background(_load_day(day))
+    return await asyncio.shield(task)
+
+
+def merge(week: Week, overlay: Day, class_number: int, class_letter: str, day: date) -> List[dict]:
+    """Уроки класса на дату: звонки дня недели с особым временем, уроки с заменами"""
+    weekday = day.weekday() + 1
+    lessons = week.lessons.get((class_number, class_letter, weekday), _EMPTY)
+    substitutions = overlay.substitutions.get((class_number, class_letter), _EMPTY)
+    schedule = []
+    for number, bell in week.bells.get(weekday, _EMPTY).items():
+        lesson = substitutions.get(number)
+        replacement = lesson is not None
+        if lesson is None:
+            lesson = lessons.get(number)
+            if lesson is None:
+                continue
+        bell = overlay.bells.get(number, bell)
+        schedule.append({
+            "start_time": bell.start_time,
+            "stop_time": bell.stop_time,
+            "lesson_number": number,
+            "title": lesson.title,
+            "classrooms": lesson.classrooms,
+            "teachers": lesson.teachers,
+            "replacement": replacement,
+        })
+    return schedule
+
+
+async def day_schedule(class_number: int, class_letter: str, day: date) -> List[dict]:
+    """Расписание класса на дату"""
+    week = await _get_week()
+    return merge(week, await _get_day(day), class_number, class_letter, day)
+
+
+def _reset_days() -> None:
+    global _generation
+    _generation += 1
+    _days.clear()
+    _day_tasks.clear()
+
+
+def _on_change(table: str) -> None:
+    global _week_dirty
+    if table in ("lessons", "lesson_time"):
+        if _week_task is not None:
+            _week_dirty = True  # текущая загрузка могла прочитать старые данные
+        _start_week_reload()
+    else:
+        _reset_days()
+
+
+listener.subscribe("timetable", _on_change)
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(TIMETABLE_RELOAD_INTERVAL)
+        _reset_days()
+        await asyncio.shield(_start_week_reload())
+
+
+def stats() -> dict:
+    return {**_counters, "dates": _days.stats()}
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: загрузка расписания и периодическая перезагрузка"""
+    global _task
+    await asyncio.shield(_start_week_reload())  # при ошибке загрузится при первом запросе
+    _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def on_cleanup(app) -> None:
+    global _task
+    tasks = [task for task in (_task, _week_task, *_day_tasks.values()) if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _task = None
+    logger.info(f"Расписание: {stats()}")
@@ -0,0 +1,137 @@
+"""Подписанные access-токены (JWT) и список их отзыва.
+
+Access-токен живёт JWT_ACCESS_TTL секунд и содержит id, класс и логин пользователя,
+поэтому проверяется без обращения к БД. Refresh-токеном остаётся непрозрачный токен из таблицы
+tokens: по нему выдаётся новый access-токен (POST /auth/refresh).
+
+Отзыв хранится компактно - одна отметка времени на пользователя (token_revocations):
+все access-токены, выпущенные раньше неё, недействительны. В памяти держатся только
+отметки не старше JWT_ACCESS_TTL - более старые токены и так истекли.
+Refresh-токены отзываются удалением строк tokens (при смене пароля - все токены пользователя).
+"""
+import asyncio
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+import jwt
+from aiohttp import web
+from config import logger, JWT_SECRET, JWT_ACCESS_TTL, JWT_REVOCATION_REFRESH
+from database.database import Database
+from database.functions import Principal, check_token
+from database.queries import Q
+
+ALGORITHM = "HS256"
+
+if JWT_SECRET:
+    _secret = JWT_SECRET
+else:
+    _secret = secrets.token_urlsafe(32)
+    logger.warning("JWT_SECRET не задан: access-токены подписываются случайным ключом "
+                   "и станут недействительны после перезапуска сервера")
+
+_revoked: Dict[int, float] = {}  # user_id -> время отзыва (unix time)
+_refresher: Optional[asyncio.Task] = None
+
+
+def is_access_token(token: str) -> bool:
+    """JWT состоит из трёх частей через точку, непрозрачные токены точек не содержат"""
+    return token.count(".") == 2
+
+
+def issue_access_token(user: Principal) -> str:
+    now = time.time()
+    payload = {
+        "sub": str(user.id),
+        "class_number": user.class_number,
+        "class_letter": user.class_letter,
+        "login": user.login,
+        "iat": now,
+        "exp": int(now) + JWT_ACCESS_TTL,
+    }
+    return jwt.encode(payload, _secret, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> Union[Principal, web.Response]:
+    """Проверка подписи, срока действия и отзыва; только CPU, без БД
+
+    :return: Пользователь из токена или web.Response 401
+    """
+    try:
+        payload = jwt.decode(token, _secret, algorithms=[ALGORITHM],
+                             options={"require": ["sub", "iat", "exp", "class_number", "class_letter", "login"]})
+    except jwt.ExpiredSignatureError:
+        return web.Response(status=401, text="Token expired")
+    except jwt.InvalidTokenError:
+        return web.Response(status=401, text="Invalid token")
+    user_id = int(payload["sub"])
+    revoked_at = _revoked.get(user_id)
+    if revoked_at is not None and payload["iat"] <= revoked_at:
+        return web.Response(status=401, text="Token revoked")
+    return Principal(user_id, payload["class_number"], payload["class_letter"], payload["login"])
+
+
+def token_response(refresh_token: str, user: Principal) -> web.Response:
+    """Ответ авторизации: прежний непрозрачный token (он же refresh) и access-токен"""
+    return web.json_response({
+        "token": refresh_token,
+        "access_token": issue_access_token(user),
+        "expires_in": JWT_ACCESS_TTL,
+    }, status=200)
+
+
+async def refresh(refresh_token: str) -> web.Response:
+    """Новый access-токен по refresh-токену"""
+    user = await check_token(refresh_token)
+    if isinstance(user, web.Response):
+        return user
+    return token_response(refresh_token, user)
+
+
+async def revoke_user(user_id: int) -> None:
+    """Отзыв всех выпущенных пользователю access-токенов"""
+    revoked_at = datetime.now(timezone.utc)
+    _revoked[user_id] = revoked_at.timestamp()
+    async with Database() as db:
+        await db.execute(Q.revocation_set, (user_id, revoked_at))
+
+
+async def load_revocations() -> None:
+    """Подгрузка отзывов, сделанных другими экземплярами сервера"""
+    since = time.time() - JWT_ACCESS_TTL
+    async with Database(readonly=True) as db:
+        rows = await db.execute_all(Q.revocations_since, (datetime.fromtimestamp(since, timezone.utc),))
+    if rows is None:
+        return
+    for user_id in [user_id for user_id, revoked_at in _revoked.items() if revoked_at <= since]:
+        del _revoked[user_id]
+    for row in rows:
+        revoked_at = row["revoked_at"].timestamp()
+        if revoked_at > _revoked.get(row["user_id"], 0):
+            _revoked[row["user_id"]] = revoked_at
+
+
+async def _run_refresher() -> None:
+    while True:
+        try:
+            await load_revocations()
+        except Exception as e:
+            logger.warning(f"Не удалось обновить список отозванных токенов: {e}")
+        await asyncio.sleep(JWT_REVOCATION_REFRESH)
+
+
+async def on_startup(app) -> None:
+    """aiohttp on_startup: периодическое обновление списка отзыва"""
+    global _refresher
+    _refresher = asyncio.get_running_loop().create_task(_run_refresher())
+
+
+async def on_cleanup(app) -> None:
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
@@ -56,8 +56,12 @@ class ExcelParser:
         
         return class_number, class_letter
     
-    async def process_excel(self, file_path):
-        workbook = openpyxl.load_workbook(file_path)
+    USER_COLUMNS = ('name', 'surname', 'middle_name', 'birthday',
+                    'class_number', 'class_letter', 'login', 'password')
+
+    def iter_users(self, file_path):
+        # Строки пользователей читаются из файла по одной, без загрузки всей книги в память
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
         
         for sheet_name in workbook.sheetnames:
             class_number, class_letter = self.parse_sheet_name(sheet_name)
@@ -86,14 +90,15 @@ class ExcelParser:
                 login = self.generate_login(name, surname[:7])
                 password = self.generate_password()
                 
-                # Вставка в базу данных
-                await self.db.execute(
-                    """INSERT INTO users (name, surname, middle_name, birthday, 
-                    class_number, class_letter, login, password)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)""",
-                    (name, surname, middle_name, birthday,
-                    int(class_number), class_letter, login, password)
-                )
+                yield (name, surname, middle_name, birthday,
+                       int(class_number), class_letter, login, password)
+        
+        workbook.close()
+    
+    async def process_excel(self, file_path):
+        # Вставка в базу данных одним потоком COPY
+        count = await self.db.copy_records('users', self.USER_COLUMNS, self.iter_users(file_path))
+        print(f"Загружено пользователей: {count}")
 
 # Пример использования
 async def main():
@@ -124,10 +124,9 @@ async def parse_excel_and_save_to_db(file_path: str):
     # Сохранение в базу данных
     async with Database() as db:
         await db.execute("DELETE FROM lessons")
-        insert_sql = """
-            INSERT INTO lessons (class_number, class_letter, day_number, title, lesson_number)
-            VALUES ($1, $2, $3, $4, $5)"""
-        await db.executemany(insert_sql, lessons_data)
+        await db.copy_records('lessons',
+                              ('class_number', 'class_letter', 'day_number', 'title', 'lesson_number'),
+                              lessons_data)
 
 async def main():
     await parse_excel_and_save_to_db('Временное расписание уроков 2025-2026.xlsx')
@@ -1,69 +1,69 @@
-import pandas as pd
 from database.database import Database
+from functions.passwords import is_hashed
 import asyncio
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment
+from openpyxl.worksheet.cell_range import CellRange
+
+HEADERS = ['Имя', 'Фамилия', 'Логин', 'Пароль', 'Класс', 'Буква']
+
+FOOTER = [
+    'Скачать приложение можно на сайте school-hub.ru',
+    'После авторизации сразу измените логин или пароль',
+    'чтобы никто больше не авторизовался под вашим именем!',
+]
+
+def finish_sheet(sheet, rows_count: int):
+    """Добавляет подписи под таблицей класса"""
+    last_row = rows_count + 1 + 2  # заголовок + строки + отступ
+    sheet.append([])
+    for offset, text in enumerate(FOOTER):
+        cell = WriteOnlyCell(sheet, value=text)
+        cell.alignment = Alignment(horizontal='center')  # Выравниваем текст по центру
+        sheet.append([cell])
+        sheet.merged_cells.add(CellRange(f"A{last_row + offset}:F{last_row + offset}"))
 
 async def export_users_to_excel(db: Database, filename: str = "users.xlsx"):
     """
-    Экспортирует данные пользователей в Excel с разделением по классам и добавляет подписи
+    Экспортирует данные пользователей в Excel с разделением по классам и добавляет подписи.
+    Строки читаются курсором и сразу пишутся в файл, поэтому память не зависит от числа пользователей
     """
-    users = await db.execute_all("""
-        SELECT name, surname, login, password, class_number, class_letter 
-        FROM users 
+    workbook = Workbook(write_only=True)
+    sheet, current_class, rows_count, total = None, None, 0, 0
+
+    async for user in db.iterate("""
+        SELECT name, surname, login, password, class_number, class_letter
+        FROM users
         ORDER BY class_number, class_letter
-    """)
+    """, batch_size=1000):
+        user_class = (user['class_number'], user['class_letter'])
+        if user_class != current_class:
+            if sheet is not None:
+                finish_sheet(sheet, rows_count)
+            current_class, rows_count = user_class, 0
+            sheet = workbook.create_sheet(title=f"{user['class_number']}{user['class_letter']}")
+            sheet.append(HEADERS)
+        # Сменённые пароли хранятся хешем - выгружаются только начальные пароли из импорта
+        password = '' if is_hashed(user['password']) else user['password']
+        sheet.append([user['name'], user['surname'], user['login'], password,
+                      user['class_number'], user['class_letter']])
+        rows_count += 1
+        total += 1
 
-    if not users:
+    if sheet is None:
         print("Не найдено пользователей для экспорта")
         return False
 
-    df = pd.DataFrame(users)
-    df = df.rename(columns={
-        'name': 'Имя',
-        'surname': 'Фамилия',
-        'login': 'Логин',
-        'password': 'Пароль',
-        'class_number': 'Класс',
-        'class_letter': 'Буква'
-    })
-    
-    # Создаем Excel-файл
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        for (class_num, class_letter), group in df.groupby(['Класс', 'Буква']):
-            class_str = f"{class_num}{class_letter}"
-            group.to_excel(writer, sheet_name=class_str, index=False)
-            
-        # Получаем workbook и обрабатываем каждый лист
-        workbook = writer.book
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            
-            # Определяем последнюю строку и объединяем столбцы
-            last_row = sheet.max_row + 2
-            merge_range = f"A{last_row}:F{last_row}"
-            sheet.merge_cells(merge_range)
-            sheet[merge_range.split(':')[0]] = 'Скачать приложение можно на сайте school-hub.ru'
-            
-            # Добавляем вторую подпись
-            merge_range2 = f"A{last_row+1}:F{last_row+1}"
-            sheet.merge_cells(merge_range2)
-            sheet[merge_range2.split(':')[0]] = 'После авторизации сразу измените логин или пароль'
-            
-            merge_range2 = f"A{last_row+2}:F{last_row+2}"
-            sheet.merge_cells(merge_range2)
-            sheet[merge_range2.split(':')[0]] = 'чтобы никто больше не авторизовался под вашим именем!'
-            
-            # Выравниваем текст по центру
-            for row in range(last_row, last_row+3):
-                sheet[f"A{row}"].alignment = Alignment(horizontal='center')
+    finish_sheet(sheet, rows_count)
+    workbook.save(filename)
 
-    print(f"Данные успешно экспортированы в файл {filename}")
+    print(f"Данные успешно экспортированы в файл {filename} ({total} пользователей)")
     return True
 
 async def main():
-    db = Database()
+    db = Database(readonly=True)
     async with db:
         await export_users_to_excel(db, "users1.xlsx")
 
-asyncio.run(main())
\ No newline at end of file
+asyncio.run(main())
@@ -0,0 +1,104 @@
+"""Ограничение частоты запросов в памяти процесса (token bucket).
+
+Для каждого ключа (IP клиента или идентификатора из тела запроса) хранится корзина
+из burst жетонов, которая пополняется равномерно за period секунд. Число ключей
+ограничено: дольше всех не использовавшиеся корзины вытесняются.
+
+Лимиты проверяются в middleware до обработчика, поэтому отклонённый запрос
+не обращается к БД.
+"""
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+from aiohttp import web
+from config import logger, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_TRUST_FORWARDED
+
+
+class Limit(NamedTuple):
+    burst: int  # запросов подряд
+    period: float  # за сколько секунд корзина наполняется заново
+
+
+class TokenBucketLimiter:
+    def __init__(self, limit: Limit, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.rate = limit.burst / limit.period  # жетонов в секунду
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (жетоны, время)
+        self.rejected = 0
+
+    def hit(self, key: Hashable) -> float:
+        """Списание жетона
+
+        :return: 0, если запрос разрешён, иначе через сколько секунд повторить
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.limit.burst, now))
+        tokens = min(self.limit.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            retry_after, tokens = 0.0, tokens - 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+            self.rejected += 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class Rule:
+    """Лимиты одного маршрута: по IP и, если задано поле, по идентификатору из тела запроса"""
+
+    def __init__(self, ip: Limit, identifier: Optional[Limit] = None, field: str = "identifier"):
+        self.ip = TokenBucketLimiter(ip)
+        self.identifier = TokenBucketLimiter(identifier) if identifier else None
+        self.field = field
+
+
+def client_ip(request: web.Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()  # адрес, добавленный нашим прокси
+    return request.remote or ""
+
+
+async def _identifier(request: web.Request, field: str) -> Optional[str]:
+    """Идентификатор из тела или строки запроса; тело кешируется aiohttp и доступно обработчику"""
+    value = request.query.get(field)
+    if value is None and request.can_read_body:
+        try:
+            data = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            data = None
+        if isinstance(data, dict):
+            value = data.get(field)
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def _too_many(retry_after: float) -> web.Response:
+    return web.Response(status=429, text="Too many requests",
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+def rate_limit_middleware(rules: Dict[Callable, Rule]):
+    """Middleware ограничения частоты для обработчиков из rules"""
+    @web.middleware
+    async def middleware(request: web.Request, handler):
+        rule = rules.get(request.match_info.handler)
+        if rule is None:
+            return await handler(request)
+        ip = client_ip(request)
+        retry_after = rule.ip.hit(ip)
+        if not retry_after and rule.identifier is not None:
+            identifier = await _identifier(request, rule.field)
+            if identifier:
+                retry_after = rule.identifier.hit(identifier)
+        if retry_after:
+            logger.warning(f"Превышен лимит запросов {request.method} {request.path} с {ip}")
+            return _too_many(retry_after)
+        return await handler(request)
+    return middleware
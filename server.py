@@ -6,10 +6,24 @@ from aiohttp_apispec import (
 )
 import aiohttp_cors
 from config import logger
+import core
+import ratelimit
 import asyncio
 from api import (auth, settings, schedule, clubs, others, achievements, events, olympiads)
 
-from database.functions import init_db
+from database.migrations import migrate
+from database import database as db_pool
+from database import functions as db_functions
+from database import sweeper
+from database import listener
+from database import outbox
+from functions import tokens
+from functions import passwords
+from functions import mail
+from functions import templates
+from functions import telegram
+from functions import broadcast
+from functions import timetable
 
 
 async def handle_get_file(request: web.Request) -> web.Response:
@@ -45,9 +59,30 @@ async def handle_get_file(request: web.Request) -> web.Response:
 
 
 if __name__ == "__main__":
-    asyncio.run(init_db())
+    asyncio.run(migrate())
     
     app = web.Application()
+    app.on_startup.append(db_pool.on_startup)
+    app.on_startup.append(tokens.on_startup)
+    app.on_startup.append(sweeper.on_startup)
+    app.on_startup.append(listener.on_startup)
+    app.on_startup.append(timetable.on_startup)
+    app.on_startup.append(templates.on_startup)
+    app.on_startup.append(mail.on_startup)
+    app.on_startup.append(outbox.on_startup)
+    app.on_startup.append(telegram.on_startup)
+    app.on_cleanup.append(telegram.on_cleanup)
+    app.on_cleanup.append(outbox.on_cleanup)
+    app.on_cleanup.append(broadcast.on_cleanup)
+    app.on_cleanup.append(mail.on_cleanup)
+    app.on_cleanup.append(templates.on_cleanup)
+    app.on_cleanup.append(timetable.on_cleanup)
+    app.on_cleanup.append(listener.on_cleanup)
+    app.on_cleanup.append(sweeper.on_cleanup)
+    app.on_cleanup.append(tokens.on_cleanup)
+    app.on_cleanup.append(passwords.on_cleanup)
+    app.on_cleanup.append(db_functions.on_cleanup)
+    app.on_cleanup.append(db_pool.on_cleanup)
 
     cors = aiohttp_cors.setup(app, defaults={
         "*": aiohttp_cors.ResourceOptions(
@@ -78,8 +113,10 @@ if __name__ == "__main__":
     routes = [
         # web.post(prefix + 'reg', auth.register),
         web.post(prefix + 'auth', auth.auth),
+        web.post(prefix + 'auth/refresh', auth.refresh),
         web.get(prefix + 'auth/telegram/url', auth.telegram_url),
         web.post(prefix + 'auth/telegram', auth.telegram),
+        web.post(prefix + 'auth/telegram/wait', auth.telegram_wait),
         web.post(prefix + 'email', auth.email_verify),
         web.get(prefix + 'verify-email', auth.email_verify_confirm),
         web.post(prefix + 'auth/forgot_password', auth.forgot_password),
@@ -120,10 +157,29 @@ if __name__ == "__main__":
         
         web.get('/{path:.*}', handle_get_file)
     ]
+
+    # Маршруты без авторизации; для остальных core.auth_middleware кладёт пользователя в request["user"]
+    public_handlers = {
+        auth.auth, auth.refresh, auth.telegram_url, auth.telegram, auth.telegram_wait,
+        auth.email_verify_confirm, auth.forgot_password, auth.forgot_password_confirm,
+        achievements.get, events.get, olympiads.get,
+        handle_get_file,
+    }
+    protected_handlers = {route.handler for route in routes} - public_handlers
+
+    # Лимиты на дорогие маршруты: проверяются до обращения к БД, при превышении - 429
+    rate_limits = {
+        auth.auth: ratelimit.Rule(ip=ratelimit.Limit(20, 60), identifier=ratelimit.Limit(5, 60)),
+        auth.forgot_password: ratelimit.Rule(ip=ratelimit.Limit(5, 600), identifier=ratelimit.Limit(3, 3600)),
+        settings.set_email: ratelimit.Rule(ip=ratelimit.Limit(5, 600), identifier=ratelimit.Limit(3, 3600), field="email"),
+    }
     
     for route in routes:
         cors.add(app.router.add_route(route.method, route.path, route.handler))
 
+    app.middlewares.append(ratelimit.rate_limit_middleware(rate_limits))
+    app.middlewares.append(db_pool.request_scope_middleware)
+    app.middlewares.append(core.auth_middleware(protected_handlers))
     app.middlewares.append(validation_middleware)
     
     logger.info("Запуск сервера. . .")
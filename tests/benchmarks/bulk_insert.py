@@ -0,0 +1,56 @@
+"""Сравнение способов массовой вставки на 100 000 строк:
+построчный execute(), executemany() и copy_records() (бинарный COPY из асинхронного итератора).
+Вставка идёт во временную таблицу со структурой lessons.
+
+Запуск из корня репозитория (нужна доступная БД из .env):
+    python -m tests.benchmarks.bulk_insert
+"""
+import asyncio
+import time
+from database.database import Database
+
+ROWS = 100_000
+COLUMNS = ('class_number', 'class_letter', 'day_number', 'title', 'lesson_number')
+INSERT = """INSERT INTO bench_lessons (class_number, class_letter, day_number, title, lesson_number)
+            VALUES ($1, $2, $3, $4, $5)"""
+
+
+def make_rows():
+    for i in range(ROWS):
+        yield (i % 11 + 1, "АБВГ"[i % 4], i % 6 + 1, f"Урок {i % 40}", i % 8 + 1)
+
+
+async def stream_rows():
+    for row in make_rows():
+        yield row
+
+
+async def row_by_row(db: Database):
+    for row in make_rows():
+        await db.execute(INSERT, row)
+
+
+async def execute_many(db: Database):
+    await db.executemany(INSERT, list(make_rows()))
+
+
+async def copy(db: Database):
+    await db.copy_records('bench_lessons', COLUMNS, stream_rows())
+
+
+async def main():
+    for name, func in [("execute построчно", row_by_row),
+                       ("executemany", execute_many),
+                       ("copy_records", copy)]:
+        async with Database() as db:
+            await db.execute("""CREATE TEMP TABLE bench_lessons
+                                (LIKE lessons INCLUDING DEFAULTS INCLUDING IDENTITY) ON COMMIT DROP""")
+            start = time.perf_counter()
+            await func(db)
+            elapsed = time.perf_counter() - start
+            count = (await db.execute("SELECT COUNT(*) AS count FROM bench_lessons"))["count"]
+        print(f"{name:<20} {elapsed:8.2f} с  {count / elapsed:10.0f} строк/с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""Микробенчмарк сериализации результата в JSON на 10 000 строк:
+execute_all() + json.dumps (как в web.json_response) против fetch_json().
+Измеряются время и пиковый объём выделенной памяти (tracemalloc).
+
+Запуск из корня репозитория (нужна доступная БД из .env):
+    python -m tests.benchmarks.fetch_json
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from database.database import Database
+
+ROWS = 10_000
+ITERATIONS = 20
+
+SQL = f"""SELECT g AS id, 'Новость ' || g AS title, repeat('описание ', 8) AS description,
+                 current_date - g AS date, (g / 7.0)::numeric(10, 2) AS xp
+          FROM generate_series(1, {ROWS}) g
+          ORDER BY g"""
+
+
+async def old_path(db: Database) -> bytes:
+    rows = await db.execute_all(SQL)
+    for row in rows:
+        row["date"] = str(row["date"])
+        row["xp"] = float(row["xp"])
+    return json.dumps(rows).encode('utf-8')
+
+
+async def new_path(db: Database) -> bytes:
+    return await db.fetch_json(SQL)
+
+
+async def measure(name, func, db):
+    await func(db)  # прогрев
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        body = await func(db)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<28} {elapsed / ITERATIONS * 1000:8.2f} мс/запрос  "
+          f"пик памяти {peak / 1024 / 1024:6.2f} МБ  размер ответа {len(body) / 1024:.0f} КБ")
+
+
+async def main():
+    async with Database(readonly=True) as db:
+        await measure("execute_all + json.dumps", old_path, db)
+        await measure("fetch_json", new_path, db)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Поиск пользователя при входе на таблице из 200 000 пользователей:
+старый запрос (email = $1 or login = $1) AND password = $2 против отдельного
+поиска по lower(login) / lower(email) через функциональные уникальные индексы.
+Работает на временной копии структуры users, для каждого запроса выводится план.
+
+Запуск из корня репозитория (нужна доступная БД из .env):
+    python -m tests.benchmarks.login_lookup
+"""
+import asyncio
+import random
+import time
+from database.database import Database
+
+USERS = 200_000
+LOOKUPS = 5_000
+
+OLD = "SELECT id FROM bench_users WHERE (email = $1 or login = $1) AND password=$2"
+BY_LOGIN = "SELECT id, password FROM bench_users WHERE lower(login) = lower($1)"
+BY_EMAIL = "SELECT id, password FROM bench_users WHERE lower(email) = lower($1)"
+
+
+async def measure(db: Database, name: str, sql: str, params: list):
+    plan = await db.connection.fetchval(f"EXPLAIN {sql}", *params[0])
+    start = time.perf_counter()
+    for item in params:
+        await db.execute(sql, item)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed / len(params) * 1e6:8.0f} мкс/запрос   план: {plan}")
+
+
+async def main():
+    async with Database() as db:
+        await db.execute("""CREATE TEMP TABLE bench_users
+                            (LIKE users INCLUDING DEFAULTS INCLUDING IDENTITY) ON COMMIT DROP""")
+        await db.execute("""INSERT INTO bench_users (email, name, surname, password, login, class_number, class_letter)
+                            SELECT 'user' || i || '@example.com', 'Имя', 'Фамилия', 'pass' || i,
+                                   'login' || i, i % 11 + 1, 'А'
+                            FROM generate_series(1, $1) AS i""", (USERS,))
+        # Индексы до изменения: уникальная почта и обычный индекс логина
+        await db.execute("CREATE UNIQUE INDEX ON bench_users (email)")
+        await db.execute("CREATE INDEX ON bench_users (login)")
+        await db.execute("ANALYZE bench_users")
+
+        ids = [random.randint(1, USERS) for _ in range(LOOKUPS)]
+        await measure(db, "OR по логину + пароль", OLD, [(f"login{i}", f"pass{i}") for i in ids])
+        await measure(db, "OR по почте + пароль", OLD, [(f"user{i}@example.com", f"pass{i}") for i in ids])
+
+        await db.execute("CREATE UNIQUE INDEX ON bench_users (lower(login))")
+        await db.execute("CREATE UNIQUE INDEX ON bench_users (lower(email))")
+        await db.execute("ANALYZE bench_users")
+        await measure(db, "lower(login)", BY_LOGIN, [(f"Login{i}",) for i in ids])
+        await measure(db, "lower(email)", BY_EMAIL, [(f"User{i}@Example.com",) for i in ids])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
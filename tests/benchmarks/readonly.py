@@ -0,0 +1,60 @@
+"""Сравнение числа обращений к БД и времени ответа для читающих запросов
+в обычном режиме (BEGIN/COMMIT) и в режиме Database(readonly=True).
+
+Запуск из корня репозитория (нужна доступная БД из .env):
+    python -m tests.benchmarks.readonly
+"""
+import asyncio
+import time
+import asyncpg
+from config import DATE_BASE_CONNECT
+from database.database import Database
+
+ITERATIONS = 200
+
+# Те же запросы, что выполняют news/*.get и schedule.info
+QUERIES = {
+    "news/events": ("SELECT title, description, image_path, date, url FROM events ORDER BY date DESC LIMIT 20", ()),
+    "news/olympiads": ("SELECT title, description, image_path, date, url FROM olympiads ORDER BY date DESC LIMIT 20", ()),
+    "schedule (lessons)": ("SELECT * FROM lessons WHERE day_number = $1 AND class_number = $2 AND class_letter = $3", (1, 10, "А")),
+}
+
+statements = 0
+
+
+def count_statement(record):
+    global statements
+    statements += 1
+
+
+async def add_logger(connection):
+    connection.add_query_logger(count_statement)
+
+
+async def run(name, sql, params, readonly):
+    global statements
+    async with Database(readonly=readonly) as db:  # прогрев пула и кеша запросов
+        await db.execute_all(sql, params)
+    statements = 0
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        async with Database(readonly=readonly) as db:
+            await db.execute_all(sql, params)
+    elapsed = time.perf_counter() - start
+    mode = "readonly" if readonly else "transaction"
+    print(f"{name:<20} {mode:<12} обращений к БД на запрос: {statements / ITERATIONS:.1f}  "
+          f"среднее время: {elapsed / ITERATIONS * 1000:.2f} мс")
+
+
+async def main():
+    Database.pool = await asyncpg.create_pool(**DATE_BASE_CONNECT, min_size=1, max_size=1, init=add_logger)
+    try:
+        for name, (sql, params) in QUERIES.items():
+            await run(name, sql, params, readonly=False)
+            await run(name, sql, params, readonly=True)
+    finally:
+        await Database.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
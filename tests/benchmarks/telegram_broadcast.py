@@ -0,0 +1,111 @@
+"""Рассылка в Telegram на RECIPIENTS получателей через локальный тестовый сервер Bot API.
+
+Тестовый сервер отвечает на sendMessage с задержкой LATENCY и, как Telegram, возвращает
+429 (retry after 1) при превышении 30 сообщений за секунду от бота или 1 сообщения
+в секунду в один чат. Сравниваются:
+  - наивная рассылка: CONCURRENCY параллельных bot.send_message, при 429 - ожидание и повтор;
+  - broadcast.send с token bucket (так сообщения отправляет диспетчер outbox).
+Для каждого режима выводится время, скорость и число ответов 429.
+Нижняя граница времени - RECIPIENTS / 30 секунд.
+
+Запуск из корня репозитория (БД и настоящий Telegram не нужны):
+    python -m tests.benchmarks.telegram_broadcast
+"""
+import asyncio
+import os
+import time
+from collections import deque
+
+PORT = int(os.getenv("BENCH_PORT", 8081))
+os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+
+from aiohttp import web
+from aiogram.exceptions import TelegramRetryAfter
+from config import bot, OUTBOX_CONCURRENCY
+from database import outbox
+from functions import broadcast
+
+RECIPIENTS = int(os.getenv("BENCH_RECIPIENTS", 2000))
+CONCURRENCY = OUTBOX_CONCURRENCY
+LATENCY = 0.05  # секунды на ответ тестового сервера
+GLOBAL_LIMIT = 30  # сообщений за секунду
+
+
+class FakeBotAPI:
+    def __init__(self):
+        self.sent = deque()  # время отправленных сообщений за последнюю секунду
+        self.last_by_chat = {}
+        self.rejected = 0
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        await asyncio.sleep(LATENCY)
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] >= 1:
+            self.sent.popleft()
+        if len(self.sent) >= GLOBAL_LIMIT or now - self.last_by_chat.get(chat_id, -1) < 1:
+            self.rejected += 1
+            return web.json_response({"ok": False, "error_code": 429,
+                                      "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}}, status=429)
+        self.sent.append(now)
+        self.last_by_chat[chat_id] = now
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(self.last_by_chat), "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"}, "text": data.get("text", "")}})
+
+
+async def naive(chat_id: int):
+    while True:
+        try:
+            return await bot.send_message(chat_id, "Замена уроков")
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def limited(chat_id: int):
+    while True:
+        try:
+            return await broadcast.send(chat_id, "Замена уроков")
+        except outbox.Retry as e:
+            await asyncio.sleep(e.after)
+
+
+async def run(name: str, api: FakeBotAPI, send, chat_ids: list):
+    queue = deque(chat_ids)
+
+    async def worker():
+        while queue:
+            await send(queue.popleft())
+
+    rejected = api.rejected
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:7.1f} с   {len(chat_ids) / elapsed:6.1f} сообщ./с   "
+          f"ответов 429: {api.rejected - rejected}")
+
+
+async def main():
+    api = FakeBotAPI()
+    app = web.Application()
+    app.router.add_post("/bot{token}/sendMessage", api.send_message)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    try:
+        print(f"Получателей: {RECIPIENTS}, параллельно: {CONCURRENCY}, "
+              f"нижняя граница: {RECIPIENTS / GLOBAL_LIMIT:.1f} с")
+        await run("наивная рассылка", api, naive, list(range(1, RECIPIENTS + 1)))
+        await asyncio.sleep(1)
+        await run("broadcast.send", api, limited, list(range(RECIPIENTS + 1, 2 * RECIPIENTS + 1)))
+        print(f"broadcast: {broadcast.stats()}")
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Нагрузочный тест входа через Telegram: массовый вход (например, 1 сентября).
+
+CLIENTS клиентов одновременно получают ссылку и ждут подтверждения в боте, которое
+приходит через случайное время до MAX_CONFIRM_DELAY секунд. Бота заменяет вставка строки
+в auth_tokens напрямую в БД (срабатывает тот же триггер NOTIFY). Сравниваются:
+  - опрос POST /auth/telegram раз в POLL_INTERVAL секунд (как сейчас делает фронтенд);
+  - долгий запрос POST /auth/telegram/wait.
+Для каждого режима выводится число HTTP-запросов и задержка между подтверждением и ответом.
+
+Запуск из корня репозитория (нужны запущенный сервер и БД из .env):
+    BENCH_USER_ID=1 python -m tests.benchmarks.telegram_login
+"""
+import asyncio
+import os
+import random
+import time
+import aiohttp
+from core import generate_unique_code
+from database.database import Database
+
+URL = os.getenv("BENCH_URL", "http://localhost:8080")
+USER_ID = int(os.environ["BENCH_USER_ID"])
+CLIENTS = int(os.getenv("BENCH_CLIENTS", 300))
+MAX_CONFIRM_DELAY = 20  # секунды
+POLL_INTERVAL = 1  # секунды
+
+
+async def bot(token: str, delay: float, confirmed: dict):
+    await asyncio.sleep(delay)
+    async with Database() as db:
+        await db.execute("INSERT INTO auth_tokens (token, user_id) VALUES ($1, $2)", (token, USER_ID))
+    confirmed[token] = time.perf_counter()
+
+
+async def poll_client(session: aiohttp.ClientSession, token: str) -> int:
+    requests = 0
+    while True:
+        requests += 1
+        async with session.post(f"{URL}/auth/telegram", json={"token": token}) as response:
+            if response.status == 200:
+                return requests
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def wait_client(session: aiohttp.ClientSession, token: str) -> int:
+    requests = 0
+    while True:
+        requests += 1
+        async with session.post(f"{URL}/auth/telegram/wait", json={"token": token}) as response:
+            if response.status == 200:
+                return requests
+
+
+async def run(name: str, client):
+    tokens = [generate_unique_code() for _ in range(CLIENTS)]
+    confirmed, answered = {}, {}
+
+    async def timed(session, token):
+        requests = await client(session, token)
+        answered[token] = time.perf_counter()
+        return requests
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[timed(session, token) for token in tokens],
+            *[bot(token, random.uniform(0, MAX_CONFIRM_DELAY), confirmed) for token in tokens])
+        elapsed = time.perf_counter() - started
+
+    async with Database() as db:
+        await db.execute("DELETE FROM tokens WHERE token = ANY($1)", (tokens,))
+        await db.execute("DELETE FROM auth_tokens WHERE token = ANY($1)", (tokens,))
+
+    requests = sum(results[:CLIENTS])
+    delays = sorted(answered[token] - confirmed[token] for token in tokens)
+    print(f"{name:<28} запросов {requests:>7}  ({requests / CLIENTS:.1f} на клиента), "
+          f"задержка ответа p50 {delays[len(delays) // 2] * 1000:.0f} мс, "
+          f"max {delays[-1] * 1000:.0f} мс, всего {elapsed:.1f} с")
+    return requests
+
+
+async def main():
+    print(f"Клиентов: {CLIENTS}, подтверждение в боте через 0-{MAX_CONFIRM_DELAY} с\n")
+    polling = await run(f"опрос раз в {POLL_INTERVAL} с", poll_client)
+    waiting = await run("долгий запрос /wait", wait_client)
+    print(f"\nДолгий запрос убирает {polling - waiting} запросов ({1 - waiting / polling:.0%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Расписание класса на день: прежняя реализация (4 запроса к БД и вложенные циклы
+по спискам словарей) против расписания в памяти (functions/timetable.py).
+
+Для LOOKUPS случайных пар (класс, дата) из таблицы lessons на ближайшие DAYS дней
+выводится время одного вызова и проверяется, что результаты совпадают.
+Первый вызов даты в timetable загружает её замены - это время входит в замер.
+
+Запуск из корня репозитория (нужна доступная БД из .env с заполненным расписанием):
+    python -m tests.benchmarks.timetable
+"""
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+from database.database import Database
+from functions import timetable
+
+LOOKUPS = 2_000
+DAYS = 14
+
+
+async def old_info(class_number: int, class_letter: str, day: date) -> list:
+    """functions/schedule.info до перехода на timetable"""
+    schedule = []
+    async with Database(readonly=True) as db:
+        lesson_times = await db.execute_all("SELECT * FROM lesson_time WHERE day_number = $1", (day.weekday()+1,))
+        lesson_times_special = await db.execute_all("SELECT * FROM lesson_time_special WHERE date = $1", (day,))
+        lessons = await db.execute_all(
+            "SELECT * FROM lessons WHERE day_number = $1 AND class_number = $2 AND class_letter = $3",
+            (day.weekday()+1, class_number, class_letter))
+        lesson_substitutions = await db.execute_all(
+            "SELECT * FROM lesson_substitutions WHERE date = $1 AND class_number = $2 AND class_letter = $3",
+            (day, class_number, class_letter))
+    for lesson_time in lesson_times:
+        for lesson_time_special in lesson_times_special:
+            if lesson_time['lesson_number'] == lesson_time_special['lesson_number']:
+                lesson_time = lesson_time_special
+                break
+        index = next((idx for idx, d in enumerate(lesson_substitutions) if d.get('lesson_number') == lesson_time['lesson_number']), None)
+        if index is None:
+            index = next((idx for idx, d in enumerate(lessons) if d.get('lesson_number') == lesson_time['lesson_number']), None)
+            if index is not None:
+                lesson_time.update(lessons[index])
+                lesson_time["replacement"] = False
+            else:
+                continue
+        else:
+            lesson_time["replacement"] = True
+            lesson_time.update(lesson_substitutions[index])
+        lesson_time.pop('id', None), lesson_time.pop('day_number', None), lesson_time.pop('date', None)
+        lesson_time.pop('class_number', None), lesson_time.pop('class_letter', None)
+        schedule.append(lesson_time)
+    return schedule
+
+
+def by_number(schedule: list) -> list:
+    return sorted(schedule, key=lambda item: item["lesson_number"])
+
+
+async def measure(name: str, function, lookups: list) -> list:
+    results = []
+    start = time.perf_counter()
+    for class_number, class_letter, day in lookups:
+        results.append(await function(class_number, class_letter, day))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed / len(lookups) * 1e6:8.0f} мкс/вызов")
+    return results
+
+
+async def main():
+    await Database.create_pool()
+    try:
+        async with Database(readonly=True) as db:
+            classes = await db.execute_all("SELECT DISTINCT class_number, class_letter FROM lessons")
+        if not classes:
+            print("Таблица lessons пуста")
+            return
+        today = date.today()
+        lookups = [(item["class_number"], item["class_letter"], today + timedelta(days=random.randrange(DAYS)))
+                   for item in (random.choice(classes) for _ in range(LOOKUPS))]
+
+        old = await measure("4 запроса + циклы", old_info, lookups)
+        started = time.perf_counter()
+        await timetable.on_startup(None)
+        print(f"{'загрузка timetable':<24} {(time.perf_counter() - started) * 1000:8.0f} мс")
+        new = await measure("timetable", timetable.day_schedule, lookups)
+        mismatches = sum(by_number(a) != b for a, b in zip(old, new))
+        print(f"Расхождений: {mismatches} из {len(lookups)}; {timetable.stats()}")
+        await timetable.on_cleanup(None)
+    finally:
+        await Database.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())